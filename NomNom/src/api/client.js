@@ -1,6 +1,8 @@
 import axios from 'axios';
 
 const API_BASE_URL = 'http://localhost:8000';
+// Account Management API (contas e pesquisa de utilizadores)
+const ACCOUNT_API_BASE_URL = 'http://localhost:8001/api/v1';
 
 const apiClient = axios.create({
   baseURL: API_BASE_URL,
@@ -9,13 +11,66 @@ const apiClient = axios.create({
   },
 });
 
-// Adicionar interceptor para incluir token
-apiClient.interceptors.request.use((config) => {
-  const token = localStorage.getItem('access_token');
-  if (token) {
-    config.headers.Authorization = `Bearer ${token}`;
-  }
-  return config;
+export const accountApiClient = axios.create({
+  baseURL: ACCOUNT_API_BASE_URL,
+  headers: {
+    'Content-Type': 'application/json',
+  },
 });
 
+// Renovar a sessão com o refresh token quando o access token expira
+let refreshPromise = null;
+
+// Os dois clientes usam a mesma sessão (tokens do Supabase Auth)
+const addAuthInterceptors = (client) => {
+  // Adicionar interceptor para incluir token
+  client.interceptors.request.use((config) => {
+    const token = localStorage.getItem('access_token');
+    if (token) {
+      config.headers.Authorization = `Bearer ${token}`;
+    }
+    return config;
+  });
+
+  client.interceptors.response.use(
+    (response) => response,
+    async (error) => {
+      const original = error.config;
+      const refreshToken = localStorage.getItem('refresh_token');
+
+      if (
+        error.response?.status !== 401 ||
+        !refreshToken ||
+        original._retry ||
+        original.url?.includes('/auth/refresh')
+      ) {
+        return Promise.reject(error);
+      }
+
+      original._retry = true;
+
+      try {
+        // Pedidos simultâneos partilham a mesma renovação
+        refreshPromise = refreshPromise || apiClient.post('/api/v1/auth/refresh', {
+          refresh_token: refreshToken,
+        });
+        const { data } = await refreshPromise;
+
+        localStorage.setItem('access_token', data.access_token);
+        localStorage.setItem('refresh_token', data.refresh_token);
+        original.headers.Authorization = `Bearer ${data.access_token}`;
+
+        return client(original);
+      } catch (refreshError) {
+        return Promise.reject(error);
+      } finally {
+        refreshPromise = null;
+      }
+    }
+  );
+};
+
+addAuthInterceptors(apiClient);
+addAuthInterceptors(accountApiClient);
+
 export default apiClient;
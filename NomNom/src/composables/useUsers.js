@@ -1,17 +1,22 @@
 import { ref } from 'vue';
-import apiClient from '@/api/client';
+import { accountApiClient } from '@/api/client';
 
 export function useUsers() {
   const users = ref([]);
   const currentUser = ref(null);
+  const nextCursor = ref(null);
+  const totalUsers = ref(null);
   const loading = ref(false);
   const error = ref(null);
+  const searchResults = ref([]);
+  const searching = ref(false);
+  let searchSeq = 0;
 
   const getUser = async (userId) => {
     loading.value = true;
     error.value = null;
     try {
-      const response = await apiClient.get(`/accounts/${userId}`);
+      const response = await accountApiClient.get(`/accounts/${userId}`);
       currentUser.value = response.data;
       return response.data;
     } catch (err) {
@@ -23,14 +28,17 @@ export function useUsers() {
     }
   };
 
-  const listUsers = async (limit = 10, offset = 0) => {
+  const listUsers = async (limit = 10, cursor = null) => {
     loading.value = true;
     error.value = null;
     try {
-      const response = await apiClient.get('/accounts/', {
-        params: { limit, offset },
+      const response = await accountApiClient.get('/accounts/', {
+        params: cursor ? { limit, cursor } : { limit },
       });
-      users.value = response.data;
+      users.value = cursor ? [...users.value, ...response.data] : response.data;
+      nextCursor.value = response.headers['x-next-cursor'] || null;
+      const total = response.headers['x-total-count'];
+      totalUsers.value = total !== undefined ? Number(total) : null;
       return response.data;
     } catch (err) {
       error.value = err.response?.data?.detail || 'Erro ao listar usuários';
@@ -39,11 +47,41 @@ export function useUsers() {
     }
   };
 
+  // Só a resposta da pesquisa mais recente atualiza searchResults
+  const searchUsers = async (query, limit = 10) => {
+    const seq = ++searchSeq;
+    if (!query.trim()) {
+      searchResults.value = [];
+      searching.value = false;
+      return [];
+    }
+    searching.value = true;
+    error.value = null;
+    try {
+      const response = await accountApiClient.get('/utilizador/search', {
+        params: { q: query.trim(), limit },
+      });
+      if (seq === searchSeq) {
+        searchResults.value = response.data;
+      }
+      return response.data;
+    } catch (err) {
+      if (seq === searchSeq) {
+        error.value = err.response?.data?.detail || 'Erro ao pesquisar usuários';
+      }
+      throw err;
+    } finally {
+      if (seq === searchSeq) {
+        searching.value = false;
+      }
+    }
+  };
+
   const createUser = async (name, email, password) => {
     loading.value = true;
     error.value = null;
     try {
-      const response = await apiClient.post('/accounts/', {
+      const response = await accountApiClient.post('/accounts/', {
         name,
         email,
         password,
@@ -62,7 +100,7 @@ export function useUsers() {
     loading.value = true;
     error.value = null;
     try {
-      const response = await apiClient.put(`/accounts/${userId}`, {
+      const response = await accountApiClient.put(`/accounts/${userId}`, {
         name,
         email,
       });
@@ -80,7 +118,7 @@ export function useUsers() {
     loading.value = true;
     error.value = null;
     try {
-      await apiClient.delete(`/accounts/${userId}`);
+      await accountApiClient.delete(`/accounts/${userId}`);
       users.value = users.value.filter((u) => u.id !== userId);
       currentUser.value = null;
     } catch (err) {
@@ -94,10 +132,15 @@ export function useUsers() {
   return {
     users,
     currentUser,
+    nextCursor,
+    totalUsers,
     loading,
     error,
+    searchResults,
+    searching,
     getUser,
     listUsers,
+    searchUsers,
     createUser,
     updateUser,
     deleteUser,
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Dict, Optional
 
 
 class Settings(BaseSettings):
@@ -19,6 +20,60 @@ class Settings(BaseSettings):
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     
+    # Verificação local dos access tokens do Supabase Auth
+    supabase_jwt_secret: Optional[str] = None  # tokens HS256 (JWT secret do projeto)
+    supabase_jwks_url: Optional[str] = None  # padrão: {supabase_url}/auth/v1/.well-known/jwks.json
+    supabase_jwt_audience: str = "authenticated"
+    jwks_cache_seconds: int = 600
+    token_cache_max_entries: int = 10000
+    token_cache_incomplete_profile_seconds: int = 5  # tokens sem perfil voltam a consultar Utilizador
+    
+    # Cache do estado dos perfis (Utilizador) usada no login
+    profile_cache_max_entries: int = 10000
+    profile_cache_ttl_seconds: int = 300
+    
+    # Cache dos user_metadata atuais (nome, foto) lidos pelo /me
+    user_metadata_cache_max_entries: int = 10000
+    user_metadata_cache_ttl_seconds: int = 300
+    
+    # Filtro de emails com perfil (Bloom filter num Redis partilhado com o
+    # backend, que o alimenta); sem Redis fica desligado
+    email_filter_redis_url: Optional[str] = None
+    email_filter_refresh_seconds: int = 300
+    
+    # Índice de pesquisa de utilizadores (nome/email), recarregado periodicamente
+    user_search_refresh_seconds: int = 300
+    
+    # Clientes do Supabase Auth (login/registo/logout em paralelo)
+    auth_client_pool_size: int = 8
+    
+    # Cliente admin (update_user_by_id): conexões keep-alive e limite de concorrência
+    admin_pool_size: int = 10
+    admin_max_concurrency: int = 10
+    
+    # Total de contas em GET /accounts (header X-Total-Count)
+    accounts_count_ttl_seconds: int = 60
+    
+    # Armazenamento das fotos de perfil (endereçado por SHA-256)
+    image_store_path: str = "data/images"
+    profile_picture_max_bytes: int = 5 * 1024 * 1024
+    thumbnail_workers: int = 2
+    thumbnail_max_pending: int = 32
+    thumbnail_max_pixels: int = 40 * 1000 * 1000  # imagens maiores não são descodificadas
+    
+    # Compressão das respostas (gzip/brotli) a partir deste tamanho
+    compression_min_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+    
+    # Rate limiting (token bucket por IP e por email) nas rotas de autenticação
+    rate_limit_enabled: bool = True
+    rate_limit_redis_url: Optional[str] = None  # partilhar os buckets entre workers
+    rate_limit_rules: Dict[str, Dict[str, float]] = {
+        "/auth/login": {"ip_per_minute": 20, "email_per_minute": 5},
+        "/auth/register": {"ip_per_minute": 5, "email_per_minute": 3},
+    }
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
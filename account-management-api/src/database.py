@@ -1,5 +1,12 @@
-from supabase import create_client, Client
+import asyncio
+from typing import Callable, Optional, TypeVar
+import httpx
+from supabase import acreate_client, create_client, AsyncClient, Client
+from gotrue import SyncGoTrueAdminAPI
+from gotrue.http_clients import SyncClient
 from functools import lru_cache
+from starlette.concurrency import run_in_threadpool
+from nomnom_common.auth import AuthClientPool
 from src.config import get_settings
 
 
@@ -12,4 +19,89 @@ def get_supabase_client() -> Client:
 
 def get_db() -> Client:
     """Retorna o cliente do Supabase para uso em rotas"""
-    return get_supabase_client()
\ No newline at end of file
+    return get_supabase_client()
+
+
+_async_client: Optional[AsyncClient] = None
+_async_client_lock = asyncio.Lock()
+
+
+async def get_async_supabase_client() -> AsyncClient:
+    """
+    Retorna o cliente assíncrono do Supabase (criado uma vez)
+
+    As consultas ao PostgREST não bloqueiam o event loop e reutilizam as
+    conexões HTTP do mesmo cliente.
+    """
+    global _async_client
+    if _async_client is None:
+        async with _async_client_lock:
+            if _async_client is None:
+                settings = get_settings()
+                _async_client = await acreate_client(settings.supabase_url, settings.supabase_key)
+    return _async_client
+
+
+async def close_async_supabase_client():
+    """Fecha as conexões do cliente assíncrono (usado no shutdown)"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.postgrest.aclose()
+        _async_client = None
+
+
+T = TypeVar("T")
+
+
+@lru_cache()
+def get_auth_pool() -> AuthClientPool:
+    """Retorna o pool de clientes do Supabase Auth (cached)"""
+    settings = get_settings()
+    return AuthClientPool(settings.supabase_url, settings.supabase_key, settings.auth_client_pool_size)
+
+
+class AdminAuthClient:
+    """
+    Cliente admin do Supabase Auth partilhado por todas as operações admin
+
+    Mantém um único pool de conexões HTTP com keep-alive (sem novo handshake
+    TLS por pedido) e limita as chamadas simultâneas para que um pico de
+    pedidos não esgote as conexões.
+    """
+
+    def __init__(self, url: str, key: str, pool_size: int = 10, max_concurrency: int = 10, timeout: float = 10.0):
+        self._http_client = SyncClient(
+            http2=True,
+            follow_redirects=True,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size
+            )
+        )
+        self.admin = SyncGoTrueAdminAPI(
+            url=f"{url.rstrip('/')}/auth/v1",
+            headers={"apikey": key, "Authorization": f"Bearer {key}"},
+            http_client=self._http_client
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(self, fn: Callable[[SyncGoTrueAdminAPI], T]) -> T:
+        """Executa fn(admin) no threadpool, respeitando o limite de concorrência"""
+        async with self._semaphore:
+            return await run_in_threadpool(fn, self.admin)
+
+    def close(self):
+        self._http_client.close()
+
+
+@lru_cache()
+def get_admin_client() -> AdminAuthClient:
+    """Retorna o cliente admin do Supabase Auth (cached)"""
+    settings = get_settings()
+    return AdminAuthClient(
+        settings.supabase_url,
+        settings.supabase_key,
+        pool_size=settings.admin_pool_size,
+        max_concurrency=settings.admin_max_concurrency
+    )
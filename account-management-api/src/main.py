@@ -1,15 +1,75 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from src.routers import auth, accounts, utilizador
+from starlette.concurrency import run_in_threadpool
+from src.config import get_settings
+from src.database import close_async_supabase_client, get_admin_client
+from src.routers import auth, accounts, images, utilizador
+from src.security import get_token_cache
+from src.services.profile_cache import get_profile_cache
+from src.services.user_metadata import get_user_metadata_cache
+from src.services.email_filter import get_email_filter, load_email_filter
+from src.services.user_search import get_user_search_index
+from src.services.thumbnails import get_thumbnail_pipeline
+from src.rate_limit import get_rate_limiter
+from nomnom_common.rate_limit import RateLimitMiddleware
+from nomnom_common.compression import CompressionMiddleware
+
+
+async def refresh_email_filter():
+    """Reconstrói periodicamente o filtro de emails a partir da base de dados"""
+    interval = get_settings().email_filter_refresh_seconds
+    while True:
+        try:
+            await run_in_threadpool(load_email_filter)
+        except Exception as e:
+            print(f"Aviso: Erro ao carregar filtro de emails: {str(e)}")
+        await asyncio.sleep(interval)
+
+
+async def refresh_user_search_index():
+    """Carrega o índice de pesquisa de utilizadores e reconstrói-o periodicamente"""
+    interval = get_settings().user_search_refresh_seconds
+    while True:
+        try:
+            await run_in_threadpool(get_user_search_index().load)
+        except Exception as e:
+            print(f"Aviso: Erro ao carregar índice de pesquisa de utilizadores: {str(e)}")
+        await asyncio.sleep(interval)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Arranque e encerramento da aplicação"""
+    tasks = [
+        asyncio.create_task(refresh_email_filter()),
+        asyncio.create_task(refresh_user_search_index()),
+    ]
+    yield
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    # Fechar as conexões keep-alive do cliente admin
+    get_admin_client().close()
+    get_thumbnail_pipeline().close()
+    await close_async_supabase_client()
+
 
 app = FastAPI(
     title="Account Management API",
     description="API de gerenciamento de contas usando FastAPI e Supabase",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
+# Rate limiting: registado antes do CORS (fica por dentro), para que as
+# respostas 429 também levem os headers CORS
+app.add_middleware(RateLimitMiddleware, get_limiter=get_rate_limiter, enabled=get_settings().rate_limit_enabled)
+
 # Middleware configuration
 app.add_middleware(
     CORSMiddleware,
@@ -17,12 +77,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "Retry-After"],
+)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=get_settings().compression_min_size,
+    gzip_level=get_settings().compression_gzip_level,
+    brotli_quality=get_settings().compression_brotli_quality
 )
 
 # Include routers
 app.include_router(auth.router, prefix="/api/v1")
 app.include_router(accounts.router, prefix="/api/v1")
 app.include_router(utilizador.router, prefix="/api/v1")
+app.include_router(images.router, prefix="/api/v1")
 
 @app.get("/")
 def read_root():
@@ -30,4 +98,18 @@ def read_root():
         "message": "Welcome to the Account Management API",
         "docs": "/docs",
         "redoc": "/redoc"
-    }
\ No newline at end of file
+    }
+
+
+@app.get("/metrics")
+def metrics():
+    """Métricas das caches e do rate limiting em memória"""
+    return {
+        "token_cache": get_token_cache().stats(),
+        "profile_cache": get_profile_cache().stats(),
+        "user_metadata_cache": get_user_metadata_cache().stats(),
+        "email_filter": get_email_filter().stats(),
+        "user_search": get_user_search_index().stats(),
+        "thumbnails": get_thumbnail_pipeline().stats(),
+        "rate_limit": get_rate_limiter().stats()
+    }
@@ -0,0 +1,16 @@
+from functools import lru_cache
+
+from nomnom_common.rate_limit import InMemoryBucketStore, RateLimiter, RedisBucketStore
+
+from src.config import get_settings
+
+
+@lru_cache()
+def get_rate_limiter() -> RateLimiter:
+    """Retorna o rate limiter (cached)"""
+    settings = get_settings()
+    if settings.rate_limit_redis_url:
+        store = RedisBucketStore(settings.rate_limit_redis_url)
+    else:
+        store = InMemoryBucketStore()
+    return RateLimiter(settings.rate_limit_rules, store)
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, HTTPException, status, Query
-from typing import List
-from src.schemas.account import AccountCreate, AccountResponse, AccountUpdate
+from fastapi import APIRouter, HTTPException, status, Query, Response
+from typing import List, Optional
+from src.schemas.account import AccountCreate, AccountIdsRequest, AccountResponse, AccountUpdate
 from src.services.account_service import account_service
 
 router = APIRouter(
@@ -38,6 +38,24 @@ async def create_account(account_data: AccountCreate):
         )
 
 
+@router.post("/batch", response_model=List[AccountResponse])
+async def get_accounts_batch(request: AccountIdsRequest):
+    """
+    Busca várias contas por ID (UUID) numa única consulta
+    
+    - **ids**: Lista de UUIDs (1-1000)
+    
+    Retorna as contas encontradas pela ordem dos IDs pedidos.
+    """
+    try:
+        return await account_service.get_accounts_by_ids([str(account_id) for account_id in request.ids])
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao buscar contas: {str(e)}"
+        )
+
+
 @router.get("/{account_id}", response_model=AccountResponse)
 async def get_account(account_id: str):
     """
@@ -56,18 +74,40 @@ async def get_account(account_id: str):
 
 @router.get("/", response_model=List[AccountResponse])
 async def list_accounts(
+    response: Response,
     limit: int = Query(default=100, ge=1, le=1000),
-    offset: int = Query(default=0, ge=0)
+    cursor: Optional[str] = Query(default=None),
+    offset: int = Query(default=0, ge=0, deprecated=True)
 ):
     """
-    Lista todas as contas com paginação
+    Lista todas as contas com paginação por cursor, ordenadas por criação
     
     - **limit**: Número máximo de resultados (1-1000, padrão: 100)
-    - **offset**: Offset para paginação (padrão: 0)
+    - **cursor**: Valor do header `X-Next-Cursor` da página anterior
+    - **offset**: Paginação antiga por offset (preferir `cursor`)
+    
+    Headers da resposta:
+    - **X-Next-Cursor**: Cursor da próxima página (ausente na última)
+    - **X-Total-Count**: Total aproximado de contas
     """
     try:
-        accounts = await account_service.get_all_accounts(limit=limit, offset=offset)
+        if offset and not cursor:
+            accounts = await account_service.get_all_accounts(limit=limit, offset=offset)
+            next_cursor = None
+        else:
+            accounts, next_cursor = await account_service.get_accounts_page(limit=limit, cursor=cursor)
+        
+        total = await account_service.count_accounts()
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        if total is not None:
+            response.headers["X-Total-Count"] = str(total)
         return accounts
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
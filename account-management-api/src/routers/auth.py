@@ -1,17 +1,24 @@
-from fastapi import APIRouter, HTTPException, status, Header
-from pydantic import BaseModel, EmailStr
-from src.database import get_supabase_client
-from src.schemas.account import AccountResponse, AccountCreate
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request, status, Depends, Header
+from pydantic import BaseModel, EmailStr, Field
+from src.database import get_auth_pool, get_admin_client
+from src.schemas.account import AccountResponse, AccountCreate, CurrentUserResponse
 from src.services.account_service import account_service
-from gotrue.errors import AuthApiError
+from src.security import AuthenticatedUser, get_current_principal, revoke_token
+from src.services.profile_cache import get_profile_cache, fetch_profile_status
+from src.services.image_store import get_image_store, image_url
+from src.services.thumbnails import get_thumbnail_pipeline
+from src.services.user_metadata import get_user_metadata, get_user_metadata_cache
+from gotrue.errors import AuthApiError, AuthError
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+import asyncio
 
 router = APIRouter(
     prefix="/auth",
     tags=["authentication"]
 )
 
-supabase = get_supabase_client()
-
 
 class LoginRequest(BaseModel):
     """Schema para requisição de login"""
@@ -30,6 +37,11 @@ class LoginResponse(BaseModel):
     profile_complete: bool = False
 
 
+class RefreshRequest(BaseModel):
+    """Schema para renovar a sessão com o refresh token"""
+    refresh_token: str = Field(..., min_length=1)
+
+
 class RegisterResponse(BaseModel):
     """Schema para resposta de registro"""
     user: AccountResponse
@@ -49,19 +61,21 @@ async def register(account_data: AccountCreate):
     Retorna os dados do usuário e tokens de autenticação.
     """
     try:
-        # Criar conta usando o serviço
-        account = await account_service.create_account(account_data)
+        # Criar conta usando o serviço (o sign_up já devolve a sessão)
+        account, session = await account_service.create_account_with_session(account_data)
         
-        # Fazer login automático após registro
-        auth_response = supabase.auth.sign_in_with_password({
-            "email": account_data.email,
-            "password": account_data.password
-        })
+        if session is None:
+            # Projeto com confirmação de email: tentar o login automático
+            auth_response = await get_auth_pool().run(lambda auth: auth.sign_in_with_password({
+                "email": account_data.email,
+                "password": account_data.password
+            }))
+            session = auth_response.session
         
         session_data = {
-            "access_token": auth_response.session.access_token,
-            "refresh_token": auth_response.session.refresh_token,
-            "expires_in": auth_response.session.expires_in,
+            "access_token": session.access_token,
+            "refresh_token": session.refresh_token,
+            "expires_in": session.expires_in,
             "token_type": "bearer"
         }
         
@@ -99,11 +113,17 @@ async def login(credentials: LoginRequest):
     Retorna os tokens de acesso e refresh para autenticação.
     """
     try:
+        # Estado do perfil: da cache ou, se faltar, consultado em paralelo com o sign-in
+        profile = get_profile_cache().get(credentials.email)
+        profile_task = None
+        if profile is None:
+            profile_task = asyncio.ensure_future(run_in_threadpool(fetch_profile_status, credentials.email))
+        
         # Fazer login no Supabase Auth
-        auth_response = supabase.auth.sign_in_with_password({
+        auth_response = await get_auth_pool().run(lambda auth: auth.sign_in_with_password({
             "email": credentials.email,
             "password": credentials.password
-        })
+        }))
         
         if not auth_response.user or not auth_response.session:
             raise HTTPException(
@@ -112,6 +132,9 @@ async def login(credentials: LoginRequest):
             )
         
         # Preparar resposta com dados do usuário
+        # Metadados acabados de ler do Supabase Auth: servem o /me seguinte
+        get_user_metadata_cache().set(auth_response.user.id, auth_response.user.user_metadata)
+        
         user_response = AccountResponse(
             id=auth_response.user.id,
             email=auth_response.user.email,
@@ -120,13 +143,9 @@ async def login(credentials: LoginRequest):
         )
         
         # Verificar se existe perfil completo na tabela Utilizador
-        profile_complete = False
-        try:
-            utilizador_response = supabase.table("Utilizador").select("*").eq("email", credentials.email).execute()
-            profile_complete = bool(utilizador_response.data and len(utilizador_response.data) > 0)
-        except Exception as e:
-            print(f"Aviso: Erro ao verificar perfil de utilizador: {str(e)}")
-            profile_complete = False
+        if profile_task is not None:
+            profile = await profile_task
+        profile_complete = bool(profile and profile.exists)
         
         return LoginResponse(
             user=user_response,
@@ -150,8 +169,65 @@ async def login(credentials: LoginRequest):
         )
 
 
+@router.post("/refresh", response_model=LoginResponse)
+async def refresh(data: RefreshRequest):
+    """
+    Renova a sessão a partir do refresh token, sem pedir a senha de novo
+    
+    - **refresh_token**: Refresh token devolvido pelo login/registro
+    
+    O profile_complete vem da cache de perfis usada no login.
+    """
+    try:
+        auth_response = await get_auth_pool().run(lambda auth: auth.refresh_session(data.refresh_token))
+        
+        if not auth_response.user or not auth_response.session:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Refresh token inválido ou expirado"
+            )
+        
+        # Metadados acabados de ler do Supabase Auth: servem o /me seguinte
+        get_user_metadata_cache().set(auth_response.user.id, auth_response.user.user_metadata)
+        
+        user_response = AccountResponse(
+            id=auth_response.user.id,
+            email=auth_response.user.email,
+            name=auth_response.user.user_metadata.get("name", ""),
+            created_at=auth_response.user.created_at
+        )
+        
+        profile = get_profile_cache().get(auth_response.user.email)
+        if profile is None:
+            profile = await run_in_threadpool(fetch_profile_status, auth_response.user.email)
+        
+        return LoginResponse(
+            user=user_response,
+            access_token=auth_response.session.access_token,
+            refresh_token=auth_response.session.refresh_token,
+            expires_in=auth_response.session.expires_in,
+            token_type="bearer",
+            message="Sessão renovada com sucesso",
+            profile_complete=bool(profile and profile.exists)
+        )
+        
+    except HTTPException:
+        raise
+    except AuthError:
+        # Inclui AuthSessionMissingError, que não é um AuthApiError
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token inválido ou expirado"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao renovar sessão: {str(e)}"
+        )
+
+
 @router.post("/logout")
-async def logout():
+async def logout(authorization: str = Header(None)):
     """
     Realiza logout do usuário
     
@@ -161,7 +237,14 @@ async def logout():
     3. Limpar o token localmente
     """
     try:
-        supabase.auth.sign_out()
+        if authorization and authorization.startswith("Bearer "):
+            token = authorization[7:]
+            revoke_token(token)
+            # Revogar só a sessão deste token (as outras sessões do utilizador continuam)
+            try:
+                await get_admin_client().run(lambda admin: admin.sign_out(token, scope="local"))
+            except AuthApiError:
+                pass  # Sessão já inválida ou expirada
         return {"message": "Logout realizado com sucesso"}
     except Exception as e:
         raise HTTPException(
@@ -170,38 +253,32 @@ async def logout():
         )
 
 
-@router.get("/me", response_model=AccountResponse)
-async def get_current_user():
+@router.get("/me", response_model=CurrentUserResponse)
+async def get_current_user(user: AuthenticatedUser = Depends(get_current_principal)):
     """
     Retorna dados do usuário atual (requer autenticação)
     
     Para usar este endpoint, envie o access_token no header:
     Authorization: Bearer {access_token}
     
-    Nota: Este é um exemplo básico. Para produção, implemente
-    middleware de autenticação adequado.
+    O token é verificado localmente (assinatura, expiração e audience),
+    sem chamar o Supabase Auth. O nome e a foto vêm dos metadados atuais
+    (em cache), não das claims do token, que só mudam quando é renovado.
     """
     try:
-        user = supabase.auth.get_user()
-        
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Não autenticado"
-            )
-        
-        return AccountResponse(
-            id=user.user.id,
-            email=user.user.email,
-            name=user.user.user_metadata.get("name", ""),
-            created_at=user.user.created_at
-        )
-        
+        metadata = await get_user_metadata(user.id)
     except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token inválido ou expirado"
-        )
+        print(f"Aviso: Erro ao buscar metadados do utilizador: {str(e)}")
+        metadata = user.user_metadata
+    
+    return CurrentUserResponse(
+        id=user.id,
+        email=user.email,
+        name=metadata.get("name", ""),
+        expires_at=user.expires_at,
+        profile_complete=user.profile_complete,
+        profile_picture_url=image_url(metadata.get("profile_picture_hash"))
+    )
 
 
 class UpdateNameRequest(BaseModel):
@@ -211,7 +288,7 @@ class UpdateNameRequest(BaseModel):
 
 
 @router.post("/update-name")
-async def update_name(data: UpdateNameRequest, authorization: str = Header(None)):
+async def update_name(data: UpdateNameRequest, user: AuthenticatedUser = Depends(get_current_principal)):
     """
     Atualiza o nome do utilizador
     
@@ -221,15 +298,6 @@ async def update_name(data: UpdateNameRequest, authorization: str = Header(None)
     - **name**: Novo nome (2-100 caracteres)
     """
     try:
-        # Validar token
-        if not authorization or not authorization.startswith("Bearer "):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="This endpoint requires a valid Bearer token"
-            )
-        
-        token = authorization[7:]  # Remove "Bearer " prefix
-        
         # Validar comprimento do nome
         if len(data.name.strip()) < 2:
             raise HTTPException(
@@ -243,41 +311,24 @@ async def update_name(data: UpdateNameRequest, authorization: str = Header(None)
                 detail="O nome não pode exceder 100 caracteres"
             )
         
-        # Usar Supabase para obter usuário com o token
-        from supabase import create_client
-        from src.config import get_settings
-        
-        settings = get_settings()
-        supabase_auth = create_client(settings.supabase_url, settings.supabase_key)
-        
         try:
-            # Obter usuário com o token
-            user = supabase_auth.auth.get_user(token)
-            
-            if not user or not user.user:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Token inválido ou expirado"
-                )
-            
-            user_id = user.user.id
-            
             # Atualizar metadata do usuário usando admin API
-            supabase_auth.auth.admin.update_user_by_id(
-                user_id,
+            updated = await get_admin_client().run(lambda admin: admin.update_user_by_id(
+                user.id,
                 {"user_metadata": {"name": data.name.strip()}}
-            )
+            ))
+            get_user_metadata_cache().set(user.id, updated.user.user_metadata)
             
             return {
                 "message": "Nome atualizado com sucesso",
                 "name": data.name.strip(),
-                "email": user.user.email
+                "email": user.email
             }
         except Exception as e:
             print(f"Erro ao atualizar nome: {str(e)}")
             raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail=f"Erro ao verificar token: {str(e)}"
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Erro ao atualizar nome: {str(e)}"
             )
         
     except HTTPException as he:
@@ -290,72 +341,150 @@ async def update_name(data: UpdateNameRequest, authorization: str = Header(None)
         )
 
 
-class ProfilePictureUpdate(BaseModel):
-    """Schema para atualizar foto de perfil"""
-    profile_picture: str  # Base64 encoded image
-    email: EmailStr
+# Margem para o boundary e os headers das partes do multipart
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+async def read_limited(request: Request, max_bytes: int):
+    """Lê o corpo do pedido em blocos, levantando 413 assim que passar de max_bytes"""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Pedido muito grande"
+        )
+    
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail="Pedido muito grande"
+            )
+        yield chunk
+
+
+def close_parser_files(parser: MultiPartParser):
+    """
+    Fecha os ficheiros temporários que um parse interrompido já tinha criado
+
+    As versões recentes do Starlette fazem-no sozinhas; as anteriores
+    (permitidas pelo requirements.txt) deixam-nos abertos. Fechar duas
+    vezes não tem efeito.
+    """
+    files = list(getattr(parser, "_files_to_close_on_error", []))
+    files += [value.file for _, value in parser.items if isinstance(value, UploadFile)]
+    for file in files:
+        file.close()
+
+
+async def read_profile_picture_upload(request: Request) -> UploadFile:
+    """
+    Extrai o campo `file` do multipart, aplicando o limite de tamanho durante a leitura
+    
+    O corpo é lido em streaming: um Content-Length acima do limite é recusado
+    antes de ler, e um corpo sem Content-Length é cortado ao passar do limite,
+    em vez de ser guardado por inteiro num ficheiro temporário.
+    """
+    max_bytes = get_image_store().max_bytes + MULTIPART_OVERHEAD_BYTES
+    parser = MultiPartParser(
+        request.headers,
+        read_limited(request, max_bytes),
+        max_files=1,
+        max_fields=10
+    )
+    parsed = False
+    try:
+        form = await parser.parse()
+        parsed = True
+    except MultiPartException as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=e.message
+        )
+    finally:
+        # Um 413 a meio do corpo interrompe o parse com ficheiros já criados
+        if not parsed:
+            close_parser_files(parser)
+    
+    file = form.get("file")
+    if not isinstance(file, UploadFile):
+        await form.close()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Envie a imagem no campo `file` (multipart/form-data)"
+        )
+    return file
 
 
-@router.post("/profile-picture")
-async def update_profile_picture(data: ProfilePictureUpdate, authorization: str = Header(None)):
+@router.post(
+    "/profile-picture",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["file"],
+                        "properties": {"file": {"type": "string", "format": "binary"}}
+                    }
+                }
+            }
+        }
+    }
+)
+async def update_profile_picture(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    user: AuthenticatedUser = Depends(get_current_principal)
+):
     """
     Atualiza a foto de perfil do utilizador
     
     Requer autenticação via Bearer token
     
-    Recebe a imagem em base64 e armazena nos metadados do usuário
+    Recebe a imagem em multipart/form-data (campo `file`, máximo 5MB) e
+    guarda-a no armazenamento de imagens; nos metadados do usuário fica
+    apenas o hash SHA-256. As miniaturas (64/128/256px) são geradas depois
+    da resposta e servidas em /images/{hash}?size=N. Pedidos acima do limite
+    são recusados com 413 durante a leitura do corpo.
     """
     try:
-        # Validar token
-        if not authorization or not authorization.startswith("Bearer "):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="This endpoint requires a valid Bearer token"
-            )
-        
-        token = authorization[7:]  # Remove "Bearer " prefix
-        
-        # Validar tamanho aproximado (base64 é ~1.33x maior)
-        if len(data.profile_picture) > 6.67 * 1024 * 1024:  # ~5MB em base64
+        file = await read_profile_picture_upload(request)
+        try:
+            digest, size, content_type = await run_in_threadpool(get_image_store().save, file.file)
+        except ValueError as e:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Imagem muito grande. Máximo 5MB"
+                detail=str(e)
             )
-        
-        # Usar Supabase para obter usuário com o token
-        from supabase import create_client
-        from src.config import get_settings
-        
-        settings = get_settings()
-        supabase_auth = create_client(settings.supabase_url, settings.supabase_key)
+        finally:
+            await file.close()
         
         try:
-            # Obter usuário com o token
-            user = supabase_auth.auth.get_user(token)
-            
-            if not user or not user.user:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Token inválido ou expirado"
-                )
+            # Guardar só o hash (e remover a imagem base64 antiga dos metadados)
+            updated = await get_admin_client().run(lambda admin: admin.update_user_by_id(
+                user.id,
+                {"user_metadata": {"profile_picture_hash": digest, "profile_picture": None}}
+            ))
+            get_user_metadata_cache().set(user.id, updated.user.user_metadata)
             
-            user_id = user.user.id
-            
-            # Atualizar metadata com a foto
-            supabase_auth.auth.admin.update_user_by_id(
-                user_id,
-                {"user_metadata": {"profile_picture": data.profile_picture}}
-            )
+            background_tasks.add_task(get_thumbnail_pipeline().generate, digest)
             
             return {
                 "message": "Foto de perfil atualizada com sucesso",
-                "profile_picture": data.profile_picture
+                "profile_picture_hash": digest,
+                "profile_picture_url": image_url(digest),
+                "content_type": content_type,
+                "size": size
             }
         except Exception as e:
             print(f"Erro ao atualizar foto: {str(e)}")
             raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail=f"Erro ao verificar token: {str(e)}"
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Erro ao atualizar foto de perfil: {str(e)}"
             )
         
     except HTTPException as he:
@@ -365,4 +494,4 @@ async def update_profile_picture(data: ProfilePictureUpdate, authorization: str
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Erro ao atualizar foto de perfil: {str(e)}"
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,53 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.responses import FileResponse
+from src.services.image_store import detect_image_type, get_image_store
+from src.services.thumbnails import closest_variant
+
+router = APIRouter(
+    prefix="/images",
+    tags=["images"]
+)
+
+# O conteúdo de um hash nunca muda
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+PENDING_VARIANT_CACHE_CONTROL = "public, max-age=60"
+
+
+@router.get("/{digest}")
+async def get_image(digest: str, request: Request, size: Optional[int] = Query(default=None, ge=1, le=4096)):
+    """
+    Serve uma imagem pelo seu hash SHA-256
+
+    - **size**: Tamanho de exibição em px; serve a miniatura (64/128/256)
+      mais próxima, ou o original se ainda não houver miniaturas
+
+    Suporta pedidos parciais (header Range) e revalidação por ETag.
+    """
+    path = get_image_store().path_for(digest)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Imagem não encontrada"
+        )
+
+    etag = f'"{digest}"'
+    cache_control = IMMUTABLE_CACHE_CONTROL
+    if size is not None:
+        variant = closest_variant(digest, size)
+        if variant is not None:
+            variant_size, path = variant
+            etag = f'"{digest}-{variant_size}"'
+        else:
+            # Miniaturas ainda a ser geradas: este URL vai mudar de conteúdo
+            cache_control = PENDING_VARIANT_CACHE_CONTROL
+    headers = {"Cache-Control": cache_control, "ETag": etag}
+
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    with open(path, "rb") as f:
+        content_type = detect_image_type(f.read(16)) or "application/octet-stream"
+
+    # FileResponse trata do header Range (206 / Content-Range)
+    return FileResponse(path, media_type=content_type, headers=headers)
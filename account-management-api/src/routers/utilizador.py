@@ -1,6 +1,12 @@
-from fastapi import APIRouter, HTTPException, status
-from src.schemas.utilizador import UtilizadorCreate, UtilizadorResponse, UtilizadorUpdate, TipoAlimentacao, Sexo
+import re
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from src.schemas.utilizador import UtilizadorBatchItem, UtilizadorBatchRequest, UtilizadorCreate, UtilizadorResponse, UtilizadorSearchResult, UtilizadorUpdate, TipoAlimentacao, Sexo
 from src.database import get_supabase_client
+from src.security import AuthenticatedUser, get_current_principal, get_token_cache
+from src.services.profile_cache import get_profile_cache, get_utilizador_row, get_utilizador_rows
+from src.services.email_filter import get_email_filter
+from src.services.user_search import get_user_search_index
 
 router = APIRouter(
     prefix="/utilizador",
@@ -9,6 +15,10 @@ router = APIRouter(
 
 supabase = get_supabase_client()
 
+# Caracteres com significado nos filtros do PostgREST (or_/ilike); não são
+# aceites na pesquisa direta para não alterarem a expressão do filtro
+POSTGREST_RESERVED = re.compile(r'[,()"\\*%:]')
+
 
 @router.get("/options/enums", status_code=status.HTTP_200_OK)
 async def get_enum_options():
@@ -54,12 +64,20 @@ async def check_utilizador_exists(email: str):
     - profile: dados do perfil se existir, null caso contrário
     """
     try:
-        response = supabase.table("Utilizador").select("*").eq("email", email).execute()
+        # Email de certeza sem perfil: responder sem ir à base de dados
+        if not get_email_filter().might_exist(email):
+            return {
+                "exists": False,
+                "profile": None
+            }
+        
+        # Só perfis existentes vêm da cache: o backend também cria perfis
+        row = get_utilizador_row(email)
         
-        if response.data and len(response.data) > 0:
+        if row is not None:
             return {
                 "exists": True,
-                "profile": response.data[0]
+                "profile": row
             }
         else:
             return {
@@ -74,6 +92,44 @@ async def check_utilizador_exists(email: str):
         )
 
 
+@router.get("/search", response_model=List[UtilizadorSearchResult])
+async def search_utilizadores(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(default=10, ge=1, le=50),
+    user: AuthenticatedUser = Depends(get_current_principal)
+):
+    """
+    Pesquisa utilizadores pelo início do nome ou do email
+    
+    Requer sessão iniciada (Authorization: Bearer): os resultados incluem emails.
+    
+    - **q**: Texto a pesquisar (sem distinguir maiúsculas nem acentos: "joao" encontra "João")
+    - **limit**: Número máximo de resultados (1-50, padrão: 10)
+    """
+    try:
+        index = get_user_search_index()
+        if index.ready:
+            return index.search(q, limit)
+        
+        # Índice ainda a carregar: pesquisa direta (sem dobrar acentos)
+        pattern = POSTGREST_RESERVED.sub(" ", q).strip()
+        if not pattern:
+            return []
+        response = supabase.table("Utilizador").select("email, nome").or_(
+            f'nome.ilike."{pattern}*",email.ilike."{pattern}*"'
+        ).order("nome").limit(limit).execute()
+        return [
+            {"email": row["email"], "nome": row.get("nome") or ""}
+            for row in (response.data or [])
+        ]
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao pesquisar utilizadores: {str(e)}"
+        )
+
+
 @router.post("/", response_model=UtilizadorResponse, status_code=status.HTTP_201_CREATED)
 async def create_utilizador(utilizador_data: UtilizadorCreate):
     """
@@ -88,15 +144,6 @@ async def create_utilizador(utilizador_data: UtilizadorCreate):
     - **sexo**: masculino, feminino ou outro
     """
     try:
-        # Verificar se já existe
-        existing = supabase.table("Utilizador").select("*").eq("email", utilizador_data.email).execute()
-        
-        if existing.data and len(existing.data) > 0:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="Perfil de utilizador já existe para este email"
-            )
-        
         # Criar novo utilizador
         utilizador_dict = {
             "email": utilizador_data.email,
@@ -108,14 +155,27 @@ async def create_utilizador(utilizador_data: UtilizadorCreate):
             "sexo": utilizador_data.sexo.value
         }
         
-        response = supabase.table("Utilizador").insert(utilizador_dict).execute()
+        # Antes da escrita: o filtro nunca pode dizer "não" a um perfil existente
+        get_email_filter().add(utilizador_data.email)
+        
+        # Uma única chamada: insere ou, se o email já existir, não altera nada
+        response = supabase.table("Utilizador").upsert(
+            utilizador_dict,
+            on_conflict="email",
+            ignore_duplicates=True
+        ).execute()
         
         if not response.data or len(response.data) == 0:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Erro ao criar perfil de utilizador"
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Perfil de utilizador já existe para este email"
             )
         
+        # Tokens em cache ainda têm profile_complete=False
+        get_token_cache().invalidate_email(utilizador_data.email)
+        get_profile_cache().set_row(utilizador_data.email, response.data[0])
+        get_user_search_index().upsert(utilizador_data.email, response.data[0].get("nome"))
+        
         return UtilizadorResponse(**map_db_to_response(response.data[0]))
         
     except HTTPException:
@@ -127,21 +187,55 @@ async def create_utilizador(utilizador_data: UtilizadorCreate):
         )
 
 
+@router.post("/batch", response_model=List[UtilizadorBatchItem])
+async def get_utilizadores_batch(request: UtilizadorBatchRequest):
+    """
+    Busca vários perfis de utilizador numa única chamada
+    
+    - **emails**: Lista de emails (1-100)
+    
+    Retorna um item por email, pela ordem pedida, com found=false e
+    profile=null para os emails sem perfil.
+    """
+    try:
+        # Emails de certeza sem perfil não chegam à base de dados; perfis em
+        # cache + uma única consulta para os restantes
+        answers = get_email_filter().might_exist_many(request.emails)
+        lookup = [email for email, maybe in zip(request.emails, answers) if maybe]
+        rows = get_utilizador_rows(lookup) if lookup else {}
+        
+        items = []
+        for email in request.emails:
+            row = rows.get(email)
+            items.append(UtilizadorBatchItem(
+                email=email,
+                found=row is not None,
+                profile=UtilizadorResponse(**map_db_to_response(row)) if row is not None else None
+            ))
+        return items
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao buscar utilizadores: {str(e)}"
+        )
+
+
 @router.get("/{email}", response_model=UtilizadorResponse)
 async def get_utilizador(email: str):
     """
     Busca um utilizador por email
     """
     try:
-        response = supabase.table("Utilizador").select("*").eq("email", email).execute()
+        row = get_utilizador_row(email)
         
-        if not response.data or len(response.data) == 0:
+        if row is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Perfil de utilizador não encontrado"
             )
         
-        return UtilizadorResponse(**map_db_to_response(response.data[0]))
+        return UtilizadorResponse(**map_db_to_response(row))
         
     except HTTPException:
         raise
@@ -158,15 +252,6 @@ async def update_utilizador(email: str, utilizador_data: UtilizadorUpdate):
     Atualiza dados de um utilizador existente
     """
     try:
-        # Verificar se existe
-        existing = supabase.table("Utilizador").select("*").eq("email", email).execute()
-        
-        if not existing.data or len(existing.data) == 0:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Perfil de utilizador não encontrado"
-            )
-        
         # Preparar dados para atualização (apenas campos não nulos)
         update_dict = {}
         if utilizador_data.nome is not None:
@@ -188,14 +273,19 @@ async def update_utilizador(email: str, utilizador_data: UtilizadorUpdate):
                 detail="Nenhum dado fornecido para atualização"
             )
         
+        # Sem verificação prévia: nenhuma linha atualizada = perfil inexistente
         response = supabase.table("Utilizador").update(update_dict).eq("email", email).execute()
         
         if not response.data or len(response.data) == 0:
+            get_profile_cache().invalidate(email)
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Erro ao atualizar perfil"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Perfil de utilizador não encontrado"
             )
         
+        get_profile_cache().set_row(email, response.data[0])
+        get_user_search_index().upsert(email, response.data[0].get("nome"))
+        
         return UtilizadorResponse(**map_db_to_response(response.data[0]))
         
     except HTTPException:
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 import uuid
 
@@ -30,6 +30,21 @@ class AccountResponse(AccountBase):
         from_attributes = True  # Pydantic v2
 
 
+class AccountIdsRequest(BaseModel):
+    """Schema para buscar várias contas de uma vez"""
+    ids: List[uuid.UUID] = Field(..., min_length=1, max_length=1000)
+
+
+class CurrentUserResponse(BaseModel):
+    """Schema de resposta do utilizador autenticado (a partir do access token)"""
+    id: str  # UUID do Supabase Auth
+    email: Optional[str] = None
+    name: str = ""
+    expires_at: int  # Expiração do token (epoch em segundos)
+    profile_complete: bool = False
+    profile_picture_url: Optional[str] = None
+
+
 class AccountInDB(AccountResponse):
     """Schema de Account no banco de dados"""
     pass
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional
+from typing import List, Optional
 from datetime import date
 from enum import Enum
 
@@ -56,6 +56,12 @@ class UtilizadorUpdate(BaseModel):
     sexo: Optional[Sexo] = None
 
 
+class UtilizadorSearchResult(BaseModel):
+    """Schema de um resultado da pesquisa de utilizadores"""
+    email: str
+    nome: str
+
+
 class UtilizadorResponse(BaseModel):
     """Schema de resposta com dados do utilizador"""
     email: str
@@ -68,3 +74,15 @@ class UtilizadorResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class UtilizadorBatchRequest(BaseModel):
+    """Schema para buscar vários perfis de uma vez"""
+    emails: List[str] = Field(..., min_length=1, max_length=100)
+
+
+class UtilizadorBatchItem(BaseModel):
+    """Resultado de um email na busca em lote (profile é null se não existir)"""
+    email: str
+    found: bool
+    profile: Optional[UtilizadorResponse] = None
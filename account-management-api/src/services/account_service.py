@@ -1,14 +1,23 @@
-from typing import Optional, List
-from src.database import get_supabase_client
+import base64
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import Optional, List, Tuple
+from src.config import get_settings
+from src.database import get_async_supabase_client, get_auth_pool
 from src.schemas.account import AccountCreate, AccountResponse, AccountUpdate
 from gotrue.errors import AuthApiError
+from gotrue.types import Session
 
 
 class AccountService:
     """Serviço para gerenciar contas no Supabase"""
     
     def __init__(self):
-        self.supabase = get_supabase_client()
+        # Total de contas (aproximado), recalculado no máximo a cada accounts_count_ttl_seconds
+        self._count: Optional[int] = None
+        self._count_fetched_at = 0.0
     
     async def create_account(self, account_data: AccountCreate) -> AccountResponse:
         """
@@ -23,9 +32,26 @@ class AccountService:
         Raises:
             AuthApiError: Se houver erro na criação da conta
         """
+        account, _ = await self.create_account_with_session(account_data)
+        return account
+    
+    async def create_account_with_session(self, account_data: AccountCreate) -> Tuple[AccountResponse, Optional[Session]]:
+        """
+        Cria uma nova conta e retorna também a sessão devolvida pelo sign_up
+        
+        Args:
+            account_data: Dados da conta a ser criada
+            
+        Returns:
+            (AccountResponse, Session) - a sessão é None quando o projeto
+            exige confirmação de email antes do primeiro login
+            
+        Raises:
+            ValueError: Se houver erro na criação da conta
+        """
         try:
             # Criar usuário no Supabase Auth
-            auth_response = self.supabase.auth.sign_up({
+            auth_response = await get_auth_pool().run(lambda auth: auth.sign_up({
                 "email": account_data.email,
                 "password": account_data.password,
                 "options": {
@@ -33,24 +59,34 @@ class AccountService:
                         "name": account_data.name,
                     }
                 }
-            })
+            }))
             
             if not auth_response.user:
                 raise ValueError("Erro ao criar conta. Verifique os dados fornecidos.")
             
             # Preparar resposta
-            return AccountResponse(
+            account = AccountResponse(
                 id=auth_response.user.id,
                 email=auth_response.user.email,
                 name=account_data.name,
                 created_at=auth_response.user.created_at
             )
+            return account, auth_response.session
             
         except AuthApiError as e:
             if "already registered" in str(e).lower():
                 raise ValueError("Este email já está registrado.")
             raise ValueError(f"Erro de autenticação: {str(e)}")
     
+    @staticmethod
+    def _to_account(profile: dict) -> AccountResponse:
+        return AccountResponse(
+            id=profile["id"],
+            email=profile["email"],
+            name=profile["name"],
+            created_at=profile["created_at"]
+        )
+    
     async def get_account_by_id(self, account_id: str) -> Optional[AccountResponse]:
         """
         Busca uma conta por ID
@@ -63,22 +99,120 @@ class AccountService:
         """
         try:
             # Buscar na tabela profiles (você precisa criar esta tabela no Supabase)
-            response = self.supabase.table("profiles").select("*").eq("id", account_id).execute()
+            supabase = await get_async_supabase_client()
+            response = await supabase.table("profiles").select("*").eq("id", account_id).execute()
             
             if not response.data:
                 return None
             
-            profile = response.data[0]
-            return AccountResponse(
-                id=profile["id"],
-                email=profile["email"],
-                name=profile["name"],
-                created_at=profile["created_at"]
-            )
+            return self._to_account(response.data[0])
         except Exception as e:
             print(f"Erro ao buscar conta: {str(e)}")
             return None
     
+    async def get_accounts_by_ids(self, account_ids: List[str]) -> List[AccountResponse]:
+        """
+        Busca várias contas numa única consulta
+        
+        Args:
+            account_ids: UUIDs das contas
+            
+        Returns:
+            Lista de AccountResponse pela ordem dos IDs pedidos
+            (IDs repetidos ou sem conta são ignorados)
+        """
+        unique_ids = list(dict.fromkeys(account_ids))
+        if not unique_ids:
+            return []
+        
+        supabase = await get_async_supabase_client()
+        response = await supabase.table("profiles").select("*").in_("id", unique_ids).execute()
+        
+        profiles = {profile["id"]: profile for profile in (response.data or [])}
+        return [
+            self._to_account(profiles[account_id])
+            for account_id in unique_ids
+            if account_id in profiles
+        ]
+    
+    @staticmethod
+    def encode_cursor(profile: dict) -> str:
+        """Cursor opaco com a posição (created_at, id) de uma conta"""
+        raw = json.dumps([profile["created_at"], profile["id"]]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[str, str]:
+        """
+        Posição (created_at, id) do cursor, já normalizada
+        
+        O cursor vem do cliente e acaba dentro do filtro or_() do PostgREST,
+        por isso só são aceites uma data ISO 8601 e um UUID válidos.
+        
+        Raises:
+            ValueError: Se o cursor for inválido
+        """
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            created_at, account_id = json.loads(raw)
+            return datetime.fromisoformat(created_at).isoformat(), str(uuid.UUID(account_id))
+        except Exception:
+            raise ValueError("Cursor inválido")
+    
+    async def get_accounts_page(self, limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[AccountResponse], Optional[str]]:
+        """
+        Lista contas por ordem (created_at, id) com paginação por cursor
+        
+        Cada página filtra a partir da última posição vista em vez de saltar
+        `offset` linhas, então o custo não cresce com a profundidade.
+        
+        Args:
+            limit: Número máximo de registros
+            cursor: Cursor devolvido pela página anterior (None = primeira página)
+            
+        Returns:
+            (contas, cursor da próxima página ou None se não houver mais)
+            
+        Raises:
+            ValueError: Se o cursor for inválido
+        """
+        supabase = await get_async_supabase_client()
+        query = supabase.table("profiles").select("*")
+        
+        if cursor:
+            created_at, account_id = self.decode_cursor(cursor)
+            query = query.or_(
+                f'created_at.gt."{created_at}",'
+                f'and(created_at.eq."{created_at}",id.gt."{account_id}")'
+            )
+        
+        # Um registro a mais indica se existe próxima página
+        response = await query.order("created_at").order("id").limit(limit + 1).execute()
+        profiles = response.data or []
+        
+        next_cursor = self.encode_cursor(profiles[limit - 1]) if len(profiles) > limit else None
+        return [self._to_account(profile) for profile in profiles[:limit]], next_cursor
+    
+    async def count_accounts(self) -> Optional[int]:
+        """
+        Total aproximado de contas (estimativa do PostgREST), em cache
+        
+        Returns:
+            Total de contas ou None se não for possível obtê-lo
+        """
+        ttl = get_settings().accounts_count_ttl_seconds
+        if self._count is not None and time.monotonic() - self._count_fetched_at < ttl:
+            return self._count
+        
+        try:
+            supabase = await get_async_supabase_client()
+            response = await supabase.table("profiles").select("id", count="estimated").limit(1).execute()
+            self._count = response.count
+            self._count_fetched_at = time.monotonic()
+        except Exception as e:
+            print(f"Aviso: Erro ao contar contas: {str(e)}")
+        return self._count
+    
     async def get_all_accounts(self, limit: int = 100, offset: int = 0) -> List[AccountResponse]:
         """
         Lista todas as contas
@@ -91,17 +225,10 @@ class AccountService:
             Lista de AccountResponse
         """
         try:
-            response = self.supabase.table("profiles").select("*").range(offset, offset + limit - 1).execute()
-            
-            return [
-                AccountResponse(
-                    id=profile["id"],
-                    email=profile["email"],
-                    name=profile["name"],
-                    created_at=profile["created_at"]
-                )
-                for profile in response.data
-            ]
+            supabase = await get_async_supabase_client()
+            response = await supabase.table("profiles").select("*").range(offset, offset + limit - 1).execute()
+            
+            return [self._to_account(profile) for profile in response.data]
         except Exception as e:
             print(f"Erro ao listar contas: {str(e)}")
             return []
@@ -126,18 +253,13 @@ class AccountService:
                 return await self.get_account_by_id(account_id)
             
             # Atualizar na tabela profiles
-            response = self.supabase.table("profiles").update(update_data).eq("id", account_id).execute()
+            supabase = await get_async_supabase_client()
+            response = await supabase.table("profiles").update(update_data).eq("id", account_id).execute()
             
             if not response.data:
                 return None
             
-            profile = response.data[0]
-            return AccountResponse(
-                id=profile["id"],
-                email=profile["email"],
-                name=profile["name"],
-                created_at=profile["created_at"]
-            )
+            return self._to_account(response.data[0])
         except Exception as e:
             print(f"Erro ao atualizar conta: {str(e)}")
             return None
@@ -154,7 +276,8 @@ class AccountService:
         """
         try:
             # Deletar da tabela profiles
-            response = self.supabase.table("profiles").delete().eq("id", account_id).execute()
+            supabase = await get_async_supabase_client()
+            response = await supabase.table("profiles").delete().eq("id", account_id).execute()
             return True
         except Exception as e:
             print(f"Erro ao deletar conta: {str(e)}")
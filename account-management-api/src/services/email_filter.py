@@ -0,0 +1,35 @@
+from functools import lru_cache
+from typing import List
+
+from nomnom_common.email_filter import EmailFilter
+
+from src.config import get_settings
+from src.database import get_supabase_client
+
+
+@lru_cache()
+def get_email_filter() -> EmailFilter:
+    """Retorna o filtro de emails com perfil, partilhado com o backend (cached)"""
+    return EmailFilter(get_settings().email_filter_redis_url)
+
+
+def load_email_filter(page_size: int = 1000):
+    """Acrescenta ao filtro todos os emails da tabela Utilizador"""
+    email_filter = get_email_filter()
+    if not email_filter.enabled:
+        return
+
+    supabase = get_supabase_client()
+    emails: List[str] = []
+    offset = 0
+    while True:
+        response = supabase.table("Utilizador").select("email").order("email").range(
+            offset, offset + page_size - 1
+        ).execute()
+        rows = response.data or []
+        emails.extend(row["email"] for row in rows if row.get("email"))
+        if len(rows) < page_size:
+            break
+        offset += page_size
+
+    email_filter.rebuild(emails, ready_seconds=3 * get_settings().email_filter_refresh_seconds)
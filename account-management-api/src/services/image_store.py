@@ -0,0 +1,132 @@
+import hashlib
+import os
+import re
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO, Optional, Tuple
+
+from src.config import get_settings
+
+
+class ImageTooLargeError(ValueError):
+    """A imagem excede o tamanho máximo permitido"""
+
+
+class InvalidImageError(ValueError):
+    """O ficheiro não é uma imagem num formato suportado"""
+
+
+# Assinaturas (magic bytes) dos formatos aceites
+IMAGE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+
+def detect_image_type(header: bytes) -> Optional[str]:
+    """Tipo MIME a partir dos primeiros bytes (None se não for suportado)"""
+    for signature, content_type in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return content_type
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+class ImageStore:
+    """
+    Armazenamento de imagens endereçado por conteúdo (SHA-256) no disco
+
+    Cada imagem fica em {root}/{hash[:2]}/{hash}; a mesma imagem enviada
+    duas vezes ocupa um único ficheiro. Como o conteúdo de um hash nunca
+    muda, os ficheiros podem ser servidos com cache imutável.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+    DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+    def __init__(self, root: str, max_bytes: int = 5 * 1024 * 1024):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, digest: str) -> Optional[Path]:
+        """Caminho da imagem com este hash, ou None se não existir"""
+        if not self.DIGEST_PATTERN.match(digest):
+            return None
+        path = self.root / digest[:2] / digest
+        return path if path.is_file() else None
+
+    def variant_path(self, digest: str, size: int) -> Path:
+        """Caminho da miniatura de um tamanho (exista ou não)"""
+        return self.root / digest[:2] / f"{digest}-{size}.webp"
+
+    def variant_for(self, digest: str, size: int) -> Optional[Path]:
+        """Caminho da miniatura de um tamanho, ou None se ainda não existir"""
+        if not self.DIGEST_PATTERN.match(digest):
+            return None
+        path = self.variant_path(digest, size)
+        return path if path.is_file() else None
+
+    def save(self, source: BinaryIO) -> Tuple[str, int, str]:
+        """
+        Copia a imagem em blocos para o armazenamento, calculando o hash
+
+        Returns:
+            (hash SHA-256, tamanho em bytes, tipo MIME)
+
+        Raises:
+            ImageTooLargeError: Se a imagem exceder max_bytes
+            InvalidImageError: Se não for PNG, JPEG, GIF ou WebP
+        """
+        digest = hashlib.sha256()
+        size = 0
+        content_type = None
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                while True:
+                    chunk = source.read(self.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if content_type is None:
+                        content_type = detect_image_type(chunk)
+                        if content_type is None:
+                            raise InvalidImageError("Formato de imagem não suportado. Use PNG, JPEG, GIF ou WebP")
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise ImageTooLargeError(f"Imagem muito grande. Máximo {self.max_bytes // (1024 * 1024)}MB")
+                    digest.update(chunk)
+                    tmp.write(chunk)
+
+            if content_type is None:
+                raise InvalidImageError("Ficheiro vazio")
+
+            hex_digest = digest.hexdigest()
+            target = self.root / hex_digest[:2] / hex_digest
+            target.parent.mkdir(exist_ok=True)
+            if target.exists():
+                os.unlink(tmp_path)
+            else:
+                os.replace(tmp_path, target)
+            return hex_digest, size, content_type
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+@lru_cache()
+def get_image_store() -> ImageStore:
+    """Retorna o armazenamento de imagens (cached)"""
+    settings = get_settings()
+    return ImageStore(settings.image_store_path, max_bytes=settings.profile_picture_max_bytes)
+
+
+def image_url(digest: Optional[str]) -> Optional[str]:
+    """URL pública de uma imagem do armazenamento"""
+    return f"/api/v1/images/{digest}" if digest else None
@@ -0,0 +1,161 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import get_settings
+from src.database import get_supabase_client
+
+
+class ProfileStatus:
+    """Estado do perfil de um email na tabela Utilizador (e a linha, se conhecida)"""
+
+    __slots__ = ("exists", "nome", "row")
+
+    def __init__(self, exists: bool, nome: Optional[str] = None, row: Optional[Dict[str, Any]] = None):
+        self.exists = exists
+        self.nome = nome
+        self.row = row
+
+
+class ProfileStatusCache:
+    """
+    Cache LRU com TTL de email -> ProfileStatus com a linha de Utilizador
+
+    Partilhada pelo login (profile_complete), pela verificação do token e
+    pelas rotas de /utilizador (get, check e update). As rotas que escrevem
+    em Utilizador atualizam a entrada; o TTL limita o tempo em que escritas
+    feitas por outro serviço ficam invisíveis. Só guarda perfis existentes:
+    o backend também cria perfis, por isso um "não existe" tem sempre de ser
+    confirmado na base de dados.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, ProfileStatus]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, email: str) -> Optional[ProfileStatus]:
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[email]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(email)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, email: str, exists: bool, nome: Optional[str] = None, row: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            self._entries.pop(email, None)
+            if not exists:
+                return
+            self._entries[email] = (time.monotonic() + self.ttl_seconds, ProfileStatus(exists, nome, row))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def set_row(self, email: str, row: Optional[Dict[str, Any]]):
+        """Guarda a linha de Utilizador do email (None = não existe perfil: descarta a entrada)"""
+        if row is None:
+            self.set(email, False)
+        else:
+            self.set(email, True, row.get("nome"), dict(row))
+
+    def invalidate(self, email: str):
+        with self._lock:
+            self._entries.pop(email, None)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+
+@lru_cache()
+def get_profile_cache() -> ProfileStatusCache:
+    """Retorna a cache de estado dos perfis (cached)"""
+    settings = get_settings()
+    return ProfileStatusCache(
+        max_entries=settings.profile_cache_max_entries,
+        ttl_seconds=settings.profile_cache_ttl_seconds
+    )
+
+
+def get_utilizador_row(email: str) -> Optional[Dict[str, Any]]:
+    """
+    Linha de Utilizador do email, da cache ou da base de dados (guardando-a)
+
+    A cache só guarda perfis existentes: um "não existe" vem sempre da base
+    de dados, porque o perfil pode ter sido criado pelo backend.
+
+    Raises:
+        Exception: Se a consulta à base de dados falhar
+    """
+    profile = get_profile_cache().get(email)
+    if profile is not None and profile.row is not None:
+        return dict(profile.row)
+
+    response = get_supabase_client().table("Utilizador").select("*").eq("email", email).limit(1).execute()
+    row = response.data[0] if response.data else None
+    get_profile_cache().set_row(email, row)
+    return row
+
+
+def get_utilizador_rows(emails: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Linhas de Utilizador de vários emails (None para os que não existem)
+
+    Os perfis em cache não são consultados; os restantes vêm de uma única
+    consulta in_() e ficam em cache.
+
+    Raises:
+        Exception: Se a consulta à base de dados falhar
+    """
+    cache = get_profile_cache()
+    rows: Dict[str, Optional[Dict[str, Any]]] = {}
+    missing = []
+    for email in dict.fromkeys(emails):
+        profile = cache.get(email)
+        if profile is not None and profile.row is not None:
+            rows[email] = dict(profile.row)
+        else:
+            missing.append(email)
+
+    if missing:
+        response = get_supabase_client().table("Utilizador").select("*").in_("email", missing).execute()
+        found = {row["email"]: row for row in (response.data or [])}
+        for email in missing:
+            rows[email] = found.get(email)
+            cache.set_row(email, rows[email])
+    return rows
+
+
+def fetch_profile_status(email: str) -> Optional[ProfileStatus]:
+    """
+    Consulta Utilizador e guarda o resultado em cache
+
+    Retorna None se a consulta falhar.
+    """
+    try:
+        row = get_utilizador_row(email)
+    except Exception as e:
+        print(f"Aviso: Erro ao buscar dados do Utilizador: {str(e)}")
+        return None
+
+    if row is None:
+        return ProfileStatus(False)
+    return ProfileStatus(True, row.get("nome"), row)
@@ -0,0 +1,151 @@
+import asyncio
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from src.config import get_settings
+from src.services.image_store import get_image_store
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow é opcional: sem ele servem-se só os originais
+    Image = None
+
+THUMBNAIL_SIZES = (64, 128, 256)
+
+
+def render_thumbnails(source: str, targets: Dict[int, str], max_pixels: int) -> List[int]:
+    """
+    Gera as miniaturas de uma imagem (corre num processo do pool)
+
+    Uma imagem pequena em bytes pode declarar dimensões enormes
+    (decompression bomb): as dimensões do cabeçalho são verificadas antes
+    de descodificar e o limite do Pillow (MAX_IMAGE_PIXELS, com o aviso
+    tratado como erro) cobre o resto.
+
+    Args:
+        source: Caminho da imagem original
+        targets: {tamanho em px: caminho de destino .webp}
+        max_pixels: Número máximo de píxeis (largura x altura) a descodificar
+
+    Returns:
+        Tamanhos gerados
+
+    Raises:
+        ValueError, DecompressionBombWarning, DecompressionBombError: Se a
+        imagem tiver mais de max_pixels píxeis
+    """
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", Image.DecompressionBombWarning)
+        # Image.open só lê o cabeçalho: nada foi descodificado ainda
+        with Image.open(source) as image:
+            width, height = image.size
+            if width * height > max_pixels:
+                raise ValueError(f"Imagem demasiado grande: {width}x{height} píxeis")
+            image = ImageOps.exif_transpose(image)
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+            generated = []
+            # Do maior para o menor: cada redução parte de uma imagem já pequena
+            for size in sorted(targets, reverse=True):
+                image.thumbnail((size, size), Image.LANCZOS)
+                tmp_path = f"{targets[size]}.tmp"
+                image.save(tmp_path, "WEBP", quality=85, method=4)
+                os.replace(tmp_path, targets[size])
+                generated.append(size)
+    return generated
+
+
+def closest_variant(digest: str, size: int) -> Optional[Tuple[int, Path]]:
+    """
+    Miniatura mais adequada para mostrar a imagem com `size` px
+
+    Prefere a menor miniatura com pelo menos `size` px; se nenhuma for
+    suficiente usa a maior. None se ainda não houver miniaturas.
+    """
+    store = get_image_store()
+    larger = [s for s in THUMBNAIL_SIZES if s >= size]
+    smaller = [s for s in THUMBNAIL_SIZES if s < size]
+    for candidate in larger + sorted(smaller, reverse=True):
+        path = store.variant_for(digest, candidate)
+        if path is not None:
+            return candidate, path
+    return None
+
+
+class ThumbnailPipeline:
+    """
+    Gera as miniaturas (64/128/256px) das fotos de perfil fora do event loop
+
+    A descodificação e o redimensionamento correm num ProcessPoolExecutor
+    com poucos processos; um semáforo limita os trabalhos em espera para
+    que um pico de uploads não acumule memória. Imagens com mais de
+    max_pixels píxeis não são descodificadas (ficam só com o original).
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 32, max_pixels: int = 40 * 1000 * 1000):
+        self.workers = workers
+        self.max_pixels = max_pixels
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._semaphore = asyncio.Semaphore(max_pending)
+        self.generated = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return Image is not None
+
+    async def generate(self, digest: str):
+        """Gera as miniaturas em falta de uma imagem do armazenamento"""
+        if not self.enabled:
+            return
+
+        store = get_image_store()
+        source = store.path_for(digest)
+        if source is None:
+            return
+
+        targets = {
+            size: str(store.variant_path(digest, size))
+            for size in THUMBNAIL_SIZES
+            if store.variant_for(digest, size) is None
+        }
+        if not targets:
+            return
+
+        async with self._semaphore:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            try:
+                loop = asyncio.get_running_loop()
+                generated = await loop.run_in_executor(self._pool, render_thumbnails, str(source), targets, self.max_pixels)
+                self.generated += len(generated)
+            except Exception as e:
+                self.failed += 1
+                print(f"Aviso: Erro ao gerar miniaturas de {digest}: {str(e)}")
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "enabled": self.enabled,
+            "generated": self.generated,
+            "failed": self.failed,
+        }
+
+
+@lru_cache()
+def get_thumbnail_pipeline() -> ThumbnailPipeline:
+    """Retorna o pipeline de miniaturas (cached)"""
+    settings = get_settings()
+    return ThumbnailPipeline(
+        workers=settings.thumbnail_workers,
+        max_pending=settings.thumbnail_max_pending,
+        max_pixels=settings.thumbnail_max_pixels
+    )
@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+from src.config import get_settings
+from src.database import get_admin_client
+
+
+class UserMetadataCache:
+    """
+    Cache LRU com TTL de user id -> user_metadata atual do Supabase Auth
+
+    As claims do access token ficam congeladas até à próxima renovação, por
+    isso o /me lê o nome e a foto de perfil daqui. As rotas que alteram os
+    metadados (nome, foto) guardam o resultado (write-through); o TTL limita
+    o tempo em que alterações feitas por outro worker ficam invisíveis.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return dict(entry[1])
+
+    def set(self, user_id: str, metadata: Optional[Dict[str, Any]]):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._entries[user_id] = (time.monotonic() + self.ttl_seconds, dict(metadata or {}))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+
+@lru_cache()
+def get_user_metadata_cache() -> UserMetadataCache:
+    """Retorna a cache de metadados dos utilizadores (cached)"""
+    settings = get_settings()
+    return UserMetadataCache(
+        max_entries=settings.user_metadata_cache_max_entries,
+        ttl_seconds=settings.user_metadata_cache_ttl_seconds
+    )
+
+
+async def get_user_metadata(user_id: str) -> Dict[str, Any]:
+    """
+    user_metadata atual do utilizador, da cache ou da admin API (guardando-o)
+
+    Raises:
+        Exception: Se a chamada à admin API falhar
+    """
+    cache = get_user_metadata_cache()
+    metadata = cache.get(user_id)
+    if metadata is not None:
+        return metadata
+
+    response = await get_admin_client().run(lambda admin: admin.get_user_by_id(user_id))
+    metadata = response.user.user_metadata if response and response.user else {}
+    cache.set(user_id, metadata)
+    return dict(metadata or {})
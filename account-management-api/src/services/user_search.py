@@ -0,0 +1,147 @@
+import bisect
+import heapq
+import threading
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from src.database import get_supabase_client
+
+
+def fold(text: str) -> str:
+    """Minúsculas e sem acentos ("João" -> "joao")"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+class UserSearchIndex:
+    """
+    Índice de prefixos em memória sobre Utilizador.nome e email
+
+    Cada palavra do nome, o nome completo e o email entram numa lista
+    ordenada de (chave, email); uma pesquisa por prefixo é um bisect seguido
+    de uma leitura sequencial. As rotas de criação/atualização mantêm o
+    índice atualizado e, como o backend também escreve em Utilizador, o
+    índice é reconstruído periodicamente (ver refresh_user_search_index no main).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys: List[Tuple[str, str]] = []
+        self._users: Dict[str, str] = {}  # email -> nome
+        self._upserted_during_load: Optional[Dict[str, str]] = None
+        self.ready = False
+        self.searches = 0
+
+    @staticmethod
+    def _index_keys(email: str, nome: str) -> List[Tuple[str, str]]:
+        folded_nome = fold(nome or "")
+        keys = {folded_nome, fold(email)}
+        keys.update(folded_nome.split())
+        keys.discard("")
+        return [(key, email) for key in keys]
+
+    def upsert(self, email: str, nome: Optional[str]):
+        """Adiciona ou atualiza um utilizador no índice"""
+        with self._lock:
+            self._remove(email)
+            self._users[email] = nome or ""
+            for entry in self._index_keys(email, nome or ""):
+                bisect.insort(self._keys, entry)
+            if self._upserted_during_load is not None:
+                self._upserted_during_load[email] = nome or ""
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, str]]:
+        """
+        Utilizadores cujo nome/email começa pelos termos da pesquisa
+
+        Com vários termos ("ana sil") todos têm de ser prefixo de alguma
+        palavra do nome ou do email. Nomes que começam pela pesquisa
+        completa aparecem primeiro.
+        """
+        terms = fold(query).split()
+        if not terms:
+            return []
+        full_query = " ".join(terms)
+
+        with self._lock:
+            self.searches += 1
+            # Candidatos pelo termo mais longo (o mais seletivo)
+            candidates = self._prefix_matches(max(terms, key=len))
+            results = []
+            for email in candidates:
+                nome = self._users[email]
+                words = fold(nome).split() + [fold(email)]
+                if all(any(word.startswith(term) for word in words) for term in terms):
+                    results.append((not fold(nome).startswith(full_query), fold(nome), email, nome))
+
+        return [{"email": email, "nome": nome} for _, _, email, nome in heapq.nsmallest(limit, results)]
+
+    def load(self, page_size: int = 1000):
+        """Reconstrói o índice a partir de todos os utilizadores"""
+        with self._lock:
+            self._upserted_during_load = {}
+
+        try:
+            supabase = get_supabase_client()
+            users: Dict[str, str] = {}
+            offset = 0
+            while True:
+                response = supabase.table("Utilizador").select("email, nome").order("email").range(
+                    offset, offset + page_size - 1
+                ).execute()
+                rows = response.data or []
+                users.update((row["email"], row.get("nome") or "") for row in rows if row.get("email"))
+                if len(rows) < page_size:
+                    break
+                offset += page_size
+
+            with self._lock:
+                # Escritas feitas durante a carga prevalecem sobre a leitura
+                users.update(self._upserted_during_load)
+                keys = []
+                for email, nome in users.items():
+                    keys.extend(self._index_keys(email, nome))
+                keys.sort()
+                self._keys = keys
+                self._users = users
+                self.ready = True
+        finally:
+            with self._lock:
+                self._upserted_during_load = None
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "users": len(self._users),
+                "keys": len(self._keys),
+                "searches": self.searches,
+            }
+
+    def _prefix_matches(self, prefix: str) -> List[str]:
+        emails = []
+        seen = set()
+        i = bisect.bisect_left(self._keys, (prefix, ""))
+        while i < len(self._keys) and self._keys[i][0].startswith(prefix):
+            email = self._keys[i][1]
+            if email not in seen:
+                seen.add(email)
+                emails.append(email)
+            i += 1
+        return emails
+
+    def _remove(self, email: str):
+        nome = self._users.pop(email, None)
+        if nome is None:
+            return
+        for entry in self._index_keys(email, nome):
+            i = bisect.bisect_left(self._keys, entry)
+            if i < len(self._keys) and self._keys[i] == entry:
+                del self._keys[i]
+
+
+@lru_cache()
+def get_user_search_index() -> UserSearchIndex:
+    """Retorna o índice de pesquisa de utilizadores (cached)"""
+    return UserSearchIndex()
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Dict, Optional
 
 
 class Settings(BaseSettings):
@@ -14,6 +15,58 @@ class Settings(BaseSettings):
     api_port: int = 8000
     debug: bool = True
     
+    # Verificação local dos access tokens do Supabase Auth
+    supabase_jwt_secret: Optional[str] = None  # tokens HS256 (JWT secret do projeto)
+    supabase_jwks_url: Optional[str] = None  # padrão: {supabase_url}/auth/v1/.well-known/jwks.json
+    supabase_jwt_audience: str = "authenticated"
+    jwks_cache_seconds: int = 600
+    token_cache_max_entries: int = 10000
+    token_cache_incomplete_profile_seconds: int = 5  # tokens sem perfil voltam a consultar Utilizador
+    
+    # Cache do estado dos perfis (Utilizador) usada no login
+    profile_cache_max_entries: int = 10000
+    profile_cache_ttl_seconds: int = 300
+    
+    # Clientes do Supabase Auth (login/registo/logout em paralelo)
+    auth_client_pool_size: int = 8
+    
+    # Cache de snapshots do inventário (por utilizador)
+    inventory_cache_max_users: int = 1000
+    inventory_cache_max_bytes: int = 8 * 1024 * 1024
+    inventory_cache_ttl_seconds: int = 60
+    
+    # Agrupar atualizações rápidas de quantidade do inventário (write-behind)
+    inventory_write_buffer_enabled: bool = False
+    inventory_write_buffer_window_ms: int = 500
+    inventory_write_buffer_max_attempts: int = 5  # escritas falhadas: tentativas com backoff
+    
+    # Compressão das respostas (gzip/brotli) a partir deste tamanho
+    compression_min_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+    
+    # Cache das respostas já serializadas de /receitas e /ingredientes
+    response_cache_max_bytes: int = 32 * 1024 * 1024
+    response_cache_ttl_seconds: int = 60
+    
+    # Sincronização por deltas (/changes): recuo da consulta em relação ao
+    # cursor e idade máxima do cursor (>= retenção das lápides em SyncRemovido)
+    sync_overlap_seconds: int = 5
+    sync_tombstone_retention_days: int = 30
+    
+    # Filtro de emails com perfil, no Redis partilhado com a Account
+    # Management API (deve ser o mesmo URL); sem Redis fica desligado
+    email_filter_redis_url: Optional[str] = None
+    
+    # Rate limiting (token bucket por IP e por email) nas rotas de autenticação
+    rate_limit_enabled: bool = True
+    rate_limit_redis_url: Optional[str] = None  # partilhar os buckets entre workers
+    rate_limit_rules: Dict[str, Dict[str, float]] = {
+        "/auth/login": {"ip_per_minute": 20, "email_per_minute": 5},
+        "/auth/register": {"ip_per_minute": 5, "email_per_minute": 3},
+        "/auth/signup": {"ip_per_minute": 5, "email_per_minute": 3},
+    }
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
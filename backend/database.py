@@ -1,5 +1,6 @@
 from supabase import create_client, Client
 from functools import lru_cache
+from nomnom_common.auth import AuthClientPool
 from config import get_settings
 
 
@@ -11,3 +12,10 @@ def get_supabase_client() -> Client:
     settings = get_settings()
     supabase: Client = create_client(settings.supabase_url, settings.supabase_key)
     return supabase
+
+
+@lru_cache()
+def get_auth_pool() -> AuthClientPool:
+    """Retorna o pool de clientes do Supabase Auth (cached)"""
+    settings = get_settings()
+    return AuthClientPool(settings.supabase_url, settings.supabase_key, settings.auth_client_pool_size)
@@ -0,0 +1,17 @@
+from functools import lru_cache
+
+from nomnom_common.email_filter import EmailFilter
+
+from config import get_settings
+
+
+@lru_cache()
+def get_email_filter() -> EmailFilter:
+    """
+    Retorna o filtro de emails com perfil, partilhado com a Account
+    Management API (cached)
+
+    O backend só acrescenta emails (antes de escrever em Utilizador); quem
+    o reconstrói e o consulta é a Account Management API.
+    """
+    return EmailFilter(get_settings().email_filter_redis_url)
@@ -0,0 +1,204 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
+
+from config import get_settings
+from database import get_supabase_client
+
+
+class InventorySnapshotCache:
+    """
+    Cache LRU por utilizador com um snapshot do Inventário
+    ({idIngrediente: quantidade}).
+
+    Limitada pelo número de utilizadores e por um teto de memória estimado.
+    As rotas que escrevem no Inventário atualizam a entrada (write-through),
+    por isso as verificações de despensa não voltam à base de dados. Como o
+    inventário também pode ser alterado por outro worker ou fora desta API,
+    cada snapshot expira ao fim de ttl_seconds (as atualizações não renovam
+    o prazo).
+
+    Um snapshot lido da base de dados só é guardado se nenhuma escrita do
+    utilizador (rotas ou flush do buffer de escrita) tiver acontecido desde
+    begin_fill(): a leitura pode ter apanhado a quantidade anterior.
+    """
+
+    def __init__(self, max_users: int = 1000, max_bytes: int = 8 * 1024 * 1024, ttl_seconds: float = 60):
+        self.max_users = max_users
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[int, float]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._expires: Dict[str, float] = {}
+        self._bytes = 0
+        # Relógio de escritas: última escrita por utilizador (LRU limitada)
+        # e a mais recente das que foram descartadas dessa LRU
+        self._clock = 0
+        self._last_write: "OrderedDict[str, int]" = OrderedDict()
+        self._write_horizon = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_fills = 0
+
+    def get(self, user: str) -> Optional[Dict[int, float]]:
+        """Snapshot do utilizador (cópia) ou None se não estiver em cache"""
+        with self._lock:
+            snapshot = self._live(user)
+            if snapshot is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user)
+            self.hits += 1
+            return dict(snapshot)
+
+    def begin_fill(self) -> int:
+        """Token a obter antes de ler o inventário da base de dados para put()"""
+        with self._lock:
+            return self._clock
+
+    def put(self, user: str, snapshot: Dict[int, float], fill_token: int) -> bool:
+        """
+        Guarda o snapshot completo do inventário de um utilizador, lido
+        depois de begin_fill(); descarta-o se entretanto houve escritas
+        """
+        with self._lock:
+            if self._last_write.get(user, self._write_horizon) > fill_token:
+                self.stale_fills += 1
+                return False
+            self._store(user, dict(snapshot), time.monotonic() + self.ttl_seconds)
+            return True
+
+    def mark_written(self, user: str):
+        """Regista uma escrita no Inventário do utilizador (ex.: flush do buffer)"""
+        with self._lock:
+            self._mark_written(user)
+
+    def set_quantity(self, user: str, id_ingrediente: int, quantidade: float):
+        """Atualiza um ingrediente, se o utilizador estiver em cache"""
+        self.set_quantities(user, {id_ingrediente: quantidade})
+
+    def set_quantities(self, user: str, quantidades: Dict[int, float]):
+        """Atualiza vários ingredientes, se o utilizador estiver em cache"""
+        with self._lock:
+            self._mark_written(user)
+            snapshot = self._live(user)
+            if snapshot is None:
+                return
+            snapshot.update(quantidades)
+            self._store(user, snapshot, self._expires[user])
+
+    def remove(self, user: str, ids: Iterable[int]):
+        """Remove ingredientes do snapshot, se o utilizador estiver em cache"""
+        with self._lock:
+            self._mark_written(user)
+            snapshot = self._live(user)
+            if snapshot is None:
+                return
+            for id_ingrediente in ids:
+                snapshot.pop(id_ingrediente, None)
+            self._store(user, snapshot, self._expires[user])
+
+    def invalidate(self, user: str):
+        """Descarta o snapshot de um utilizador"""
+        with self._lock:
+            self._mark_written(user)
+            self._discard(user)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "stale_fills": self.stale_fills,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+    def _live(self, user: str) -> Optional[Dict[int, float]]:
+        """Snapshot em cache ainda dentro do prazo (descarta-o se expirou)"""
+        snapshot = self._entries.get(user)
+        if snapshot is not None and self._expires[user] <= time.monotonic():
+            self._discard(user)
+            return None
+        return snapshot
+
+    def _store(self, user: str, snapshot: Dict[int, float], expires_at: float):
+        self._discard(user)
+        size = self._estimate_size(snapshot)
+        if size > self.max_bytes:
+            return
+        self._entries[user] = snapshot
+        self._sizes[user] = size
+        self._expires[user] = expires_at
+        self._bytes += size
+        while len(self._entries) > self.max_users or self._bytes > self.max_bytes:
+            evicted_user, _ = self._entries.popitem(last=False)
+            self._bytes -= self._sizes.pop(evicted_user)
+            del self._expires[evicted_user]
+            self.evictions += 1
+
+    def _mark_written(self, user: str):
+        self._clock += 1
+        self._last_write.pop(user, None)
+        self._last_write[user] = self._clock
+        while len(self._last_write) > self.max_users:
+            _, last = self._last_write.popitem(last=False)
+            self._write_horizon = max(self._write_horizon, last)
+
+    def _discard(self, user: str):
+        if self._entries.pop(user, None) is not None:
+            self._bytes -= self._sizes.pop(user)
+            del self._expires[user]
+
+    @staticmethod
+    def _estimate_size(snapshot: Dict[int, float]) -> int:
+        # dict + chave e valor de cada item (ints/floats pequenos)
+        return sys.getsizeof(snapshot) + len(snapshot) * 2 * sys.getsizeof(0)
+
+
+@lru_cache()
+def get_inventory_cache() -> InventorySnapshotCache:
+    """Retorna a cache de snapshots do inventário (cached)"""
+    settings = get_settings()
+    return InventorySnapshotCache(
+        max_users=settings.inventory_cache_max_users,
+        max_bytes=settings.inventory_cache_max_bytes,
+        ttl_seconds=settings.inventory_cache_ttl_seconds
+    )
+
+
+def get_inventory_snapshot(user_email: str) -> Dict[int, float]:
+    """
+    Retorna {idIngrediente: quantidade} do inventário do utilizador,
+    lendo da base de dados apenas quando não está em cache
+    """
+    # Import local: write_buffer depende deste módulo
+    from write_buffer import get_write_buffer
+
+    cache = get_inventory_cache()
+    snapshot = cache.get(user_email)
+    if snapshot is not None:
+        return snapshot
+
+    fill_token = cache.begin_fill()
+    supabase = get_supabase_client()
+    response = supabase.table("Inventário").select(
+        "idIngrediente, quantidade"
+    ).eq("idUtilizador", user_email).execute()
+
+    snapshot = {
+        item["idIngrediente"]: item.get("quantidade") or 0
+        for item in (response.data or [])
+    }
+    # Quantidades ainda no buffer de escrita são mais recentes que a base de dados
+    snapshot.update(get_write_buffer().pending_for_user(user_email))
+    cache.put(user_email, snapshot, fill_token)
+    return snapshot
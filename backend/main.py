@@ -15,23 +15,50 @@ app.add_middleware(
 )
 
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from config import get_settings
 from routers import auth, ingredientes, receitas, lista_compras, utilizador
+from write_buffer import get_write_buffer
+from inventory_cache import get_inventory_cache
+from security import get_token_cache
+from profile_cache import get_profile_cache
+from rate_limit import get_rate_limiter
+from nomnom_common.rate_limit import RateLimitMiddleware
+from nomnom_common.compression import CompressionMiddleware
+from responses import FastJSONResponse
+from response_cache import get_response_cache
+from singleflight import get_singleflight
 
 # Importar outros routers aqui quando criar
 # from routers import example
 
 settings = get_settings()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Arranque e encerramento da aplicação"""
+    yield
+    # Gravar as quantidades do inventário que ainda estão no buffer (best-effort:
+    # num crash, as escritas pendentes perdem-se)
+    get_write_buffer().flush_all()
+
+
 app = FastAPI(
     title="NomNom API",
     description="API para conectar o frontend com Supabase",
     version="1.0.0",
-    debug=settings.debug
+    debug=settings.debug,
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
+# Rate limiting: registado antes do CORS (fica por dentro), para que as
+# respostas 429 também levem os headers CORS
+app.add_middleware(RateLimitMiddleware, get_limiter=get_rate_limiter, enabled=settings.rate_limit_enabled)
+
 # Configurar CORS
 app.add_middleware(
     CORSMiddleware,
@@ -39,6 +66,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
+)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_min_size,
+    gzip_level=settings.compression_gzip_level,
+    brotli_quality=settings.compression_brotli_quality
 )
 
 
@@ -58,6 +92,20 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """Métricas das caches, buffers e rate limiting em memória"""
+    return {
+        "token_cache": get_token_cache().stats(),
+        "profile_cache": get_profile_cache().stats(),
+        "inventory_cache": get_inventory_cache().stats(),
+        "inventory_write_buffer": get_write_buffer().stats(),
+        "response_cache": get_response_cache().stats(),
+        "singleflight": get_singleflight().stats(),
+        "rate_limit": get_rate_limiter().stats()
+    }
+
+
 # Routers
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["Autenticação"])
 app.include_router(utilizador.router, prefix="/api/v1/utilizador", tags=["Utilizador"])
@@ -28,12 +28,26 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 
+class CurrentUserResponse(BaseModel):
+    """Modelo de resposta do utilizador autenticado (a partir do access token)"""
+    id: str
+    email: Optional[str] = None
+    name: str = ""
+    expires_at: int  # Expiração do token (epoch em segundos)
+    profile_complete: bool = False
+
+
 class LoginRequest(BaseModel):
     """Modelo para login"""
     email: EmailStr
     password: str
 
 
+class RefreshRequest(BaseModel):
+    """Modelo para renovar a sessão com o refresh token"""
+    refresh_token: str = Field(..., min_length=1)
+
+
 class LoginResponse(BaseModel):
     """Modelo de resposta do login"""
     user: UserResponse
@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from config import get_settings
+from database import get_supabase_client
+
+
+class ProfileStatus:
+    """Estado do perfil de um email na tabela Utilizador"""
+
+    __slots__ = ("exists", "nome")
+
+    def __init__(self, exists: bool, nome: Optional[str] = None):
+        self.exists = exists
+        self.nome = nome
+
+
+class ProfileStatusCache:
+    """
+    Cache LRU com TTL de email -> ProfileStatus, usada no login para
+    calcular profile_complete sem consultar a tabela Utilizador
+
+    As rotas que escrevem em Utilizador atualizam a entrada; o TTL limita
+    o tempo em que escritas feitas por outro serviço ficam invisíveis.
+    Só guarda perfis existentes: os dois serviços criam perfis, por isso um
+    "não existe" tem sempre de ser confirmado na base de dados.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, ProfileStatus]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, email: str) -> Optional[ProfileStatus]:
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[email]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(email)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, email: str, exists: bool, nome: Optional[str] = None):
+        with self._lock:
+            self._entries.pop(email, None)
+            if not exists:
+                return
+            self._entries[email] = (time.monotonic() + self.ttl_seconds, ProfileStatus(exists, nome))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, email: str):
+        with self._lock:
+            self._entries.pop(email, None)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+
+@lru_cache()
+def get_profile_cache() -> ProfileStatusCache:
+    """Retorna a cache de estado dos perfis (cached)"""
+    settings = get_settings()
+    return ProfileStatusCache(
+        max_entries=settings.profile_cache_max_entries,
+        ttl_seconds=settings.profile_cache_ttl_seconds
+    )
+
+
+def fetch_profile_status(email: str) -> Optional[ProfileStatus]:
+    """
+    Consulta Utilizador (só a coluna nome) e guarda o resultado em cache
+
+    Retorna None se a consulta falhar.
+    """
+    try:
+        response = get_supabase_client().table("Utilizador").select("nome").eq("email", email).limit(1).execute()
+    except Exception as e:
+        print(f"Aviso: Erro ao buscar dados do Utilizador: {str(e)}")
+        return None
+
+    if response.data:
+        profile = ProfileStatus(True, response.data[0].get("nome"))
+    else:
+        profile = ProfileStatus(False)
+    get_profile_cache().set(email, profile.exists, profile.nome)
+    return profile
@@ -0,0 +1,184 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi import Request, Response
+from nomnom_common.compression import choose_encoding, compress_body
+
+from config import get_settings
+from responses import FastJSONResponse
+
+
+class CachedBody:
+    """Corpo JSON já serializado e as versões comprimidas já calculadas"""
+
+    __slots__ = ("expires_at", "encodings")
+
+    def __init__(self, expires_at: float, body: bytes):
+        self.expires_at = expires_at
+        self.encodings: Dict[str, bytes] = {"identity": body}
+
+    @property
+    def size(self) -> int:
+        return sum(len(body) for body in self.encodings.values())
+
+
+class ResponseByteCache:
+    """
+    Cache LRU dos bytes finais das respostas de leitura do catálogo
+
+    A chave é (rota, parâmetros declarados pela rota, versão dos dados):
+    parâmetros desconhecidos na query string não criam entradas novas, para
+    que um cliente não consiga encher a cache com variações. As rotas
+    que escrevem no catálogo chamam bump() e as entradas antigas deixam de
+    ser usadas; como as receitas também são alteradas fora desta API, cada
+    entrada expira ao fim de ttl_seconds. Limitada por um teto de bytes,
+    contando também as versões comprimidas (gzip/br) guardadas.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, ttl_seconds: float = 60, min_compress_size: int = 1024):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.min_compress_size = min_compress_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str, int], CachedBody]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def version(self, dataset: str) -> int:
+        with self._lock:
+            return self._versions.get(dataset, 0)
+
+    def bump(self, dataset: str):
+        """Marca os dados como alterados (ex.: novo ingrediente)"""
+        with self._lock:
+            self._versions[dataset] = self._versions.get(dataset, 0) + 1
+
+    def key(self, request: Request, dataset: str, params: Iterable[str] = ()) -> Tuple[str, str, int]:
+        """
+        Chave da leitura; obter antes de ler a base de dados
+
+        params: nomes dos parâmetros da query string que alteram a resposta
+        (os restantes são ignorados)
+        """
+        params = set(params)
+        query = "&".join(sorted(
+            f"{k}={v}" for k, v in request.query_params.multi_items() if k in params
+        ))
+        return request.url.path, query, self.version(dataset)
+
+    def get(self, key: Tuple[str, str, int], encoding: str = "identity", count: bool = True) -> Optional[Tuple[bytes, str]]:
+        """
+        (bytes, codificação) da resposta em cache, ou None
+
+        Comprime e guarda a versão pedida na primeira vez; corpos abaixo de
+        min_compress_size são sempre devolvidos sem compressão.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.monotonic():
+                if entry is not None:
+                    self._discard(key)
+                self.misses += count
+                return None
+            self._entries.move_to_end(key)
+            self.hits += count
+            identity = entry.encodings["identity"]
+            if encoding == "identity" or len(identity) < self.min_compress_size:
+                return identity, "identity"
+            body = entry.encodings.get(encoding)
+            if body is not None:
+                return body, encoding
+
+        body = compress_body(identity, encoding)
+        with self._lock:
+            if self._entries.get(key) is entry and encoding not in entry.encodings:
+                entry.encodings[encoding] = body
+                self._bytes += len(body)
+                self._evict()
+        return body, encoding
+
+    def put(self, key: Tuple[str, str, int], body: bytes):
+        with self._lock:
+            self._discard(key)
+            entry = CachedBody(time.monotonic() + self.ttl_seconds, body)
+            if entry.size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self._evict()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self.evictions += 1
+
+    def _discard(self, key: Tuple[str, str, int]):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+
+@lru_cache()
+def get_response_cache() -> ResponseByteCache:
+    """Retorna a cache de respostas serializadas (cached)"""
+    settings = get_settings()
+    return ResponseByteCache(
+        max_bytes=settings.response_cache_max_bytes,
+        ttl_seconds=settings.response_cache_ttl_seconds,
+        min_compress_size=settings.compression_min_size
+    )
+
+
+def _bytes_response(body: bytes, encoding: str) -> Response:
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def cached_response(request: Request, key: Tuple[str, str, int]) -> Optional[Response]:
+    """
+    Resposta pronta a enviar, se esta leitura estiver em cache
+
+    Uso:
+        key = get_response_cache().key(request, "receitas")
+        cached = cached_response(request, key)
+        if cached is not None:
+            return cached
+        ...
+        return cache_response(request, key, dados)
+    """
+    encoding = choose_encoding(request.headers.get("accept-encoding", "")) or "identity"
+    result = get_response_cache().get(key, encoding)
+    return _bytes_response(*result) if result is not None else None
+
+
+def cache_response(request: Request, key: Tuple[str, str, int], content) -> Response:
+    """Serializa o conteúdo, guarda os bytes em cache e devolve a resposta"""
+    cache = get_response_cache()
+    cache.put(key, FastJSONResponse(content).body)
+    encoding = choose_encoding(request.headers.get("accept-encoding", "")) or "identity"
+    result = cache.get(key, encoding, count=False)
+    if result is None:
+        # Corpo maior que a cache inteira: enviar sem guardar
+        return FastJSONResponse(content)
+    return _bytes_response(*result)
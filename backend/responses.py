@@ -0,0 +1,33 @@
+import json
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional: sem ele usa-se o json da biblioteca padrão
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse serializada com orjson (quando instalado)
+
+    As rotas com listas grandes devolvem-na diretamente, o que evita também
+    a passagem pelo jsonable_encoder. Tipos que o orjson não conhece caem
+    no caminho normal (jsonable_encoder + json).
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            try:
+                return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+            except TypeError:
+                pass
+        return json.dumps(
+            jsonable_encoder(content),
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":")
+        ).encode("utf-8")
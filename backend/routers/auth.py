@@ -1,20 +1,55 @@
-from fastapi import APIRouter, HTTPException, status
-from models import UserCreate, UserResponse, LoginRequest, LoginResponse
-from database import get_supabase_client
-from gotrue.errors import AuthApiError
+from fastapi import APIRouter, HTTPException, status, Depends, Header, BackgroundTasks
+from models import UserCreate, UserResponse, LoginRequest, LoginResponse, CurrentUserResponse, RefreshRequest
+from database import get_supabase_client, get_auth_pool
+from security import AuthenticatedUser, get_current_principal, get_token_cache, revoke_token
+from profile_cache import get_profile_cache, fetch_profile_status
+from email_filter import get_email_filter
+from gotrue.errors import AuthApiError, AuthError
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import time
 
 router = APIRouter()
 supabase = get_supabase_client()
 
+UTILIZADOR_INSERT_ATTEMPTS = 3
+UTILIZADOR_INSERT_BACKOFF_SECONDS = 0.5
+
+
+def insert_utilizador_with_retry(utilizador_data: dict):
+    """
+    Insere o registo na tabela Utilizador, com novas tentativas
+
+    Corre como background task depois de a resposta do registo ser enviada.
+    """
+    # Antes da escrita: o filtro de emails nunca pode dizer "não" a um perfil existente
+    get_email_filter().add(utilizador_data["email"])
+    for attempt in range(1, UTILIZADOR_INSERT_ATTEMPTS + 1):
+        try:
+            supabase.table("Utilizador").insert(utilizador_data).execute()
+            get_profile_cache().set(utilizador_data["email"], True, utilizador_data.get("nome"))
+            # Tokens em cache ainda têm profile_complete=False
+            get_token_cache().invalidate_email(utilizador_data["email"])
+            return
+        except Exception as db_error:
+            if "duplicate key" in str(db_error).lower():
+                return
+            print(f"Aviso: Erro ao inserir em Utilizador (tentativa {attempt}): {str(db_error)}")
+            if attempt < UTILIZADOR_INSERT_ATTEMPTS:
+                time.sleep(UTILIZADOR_INSERT_BACKOFF_SECONDS * 2 ** (attempt - 1))
+
 
 @router.post("/register", response_model=LoginResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate):
+async def register(user_data: UserCreate, background_tasks: BackgroundTasks):
     """
     Registra um novo usuário e cria registro na tabela Utilizador
+    
+    A resposta sai logo após o sign_up (uma única ida ao Supabase Auth);
+    o registo em Utilizador é inserido em background, com novas tentativas.
     """
     try:
         # Criar usuário no Supabase Auth
-        auth_response = supabase.auth.sign_up({
+        auth_response = await get_auth_pool().run(lambda auth: auth.sign_up({
             "email": user_data.email,
             "password": user_data.password,
             "options": {
@@ -22,7 +57,7 @@ async def register(user_data: UserCreate):
                     "name": user_data.name,
                 }
             }
-        })
+        }))
         
         if not auth_response.user:
             raise HTTPException(
@@ -30,18 +65,13 @@ async def register(user_data: UserCreate):
                 detail="Erro ao criar conta. Verifique os dados fornecidos."
             )
         
-        # Criar registro na tabela Utilizador
-        try:
-            utilizador_data = {
-                "email": user_data.email,
-                "password": user_data.password,  # Nota: em produção, considere usar hash
-                "nome": user_data.name,
-            }
-            supabase.table("Utilizador").insert(utilizador_data).execute()
-        except Exception as db_error:
-            # Se falhar ao inserir, ainda retorna sucesso de registro
-            # mas loga o erro
-            print(f"Aviso: Erro ao inserir em Utilizador: {str(db_error)}")
+        # Criar registro na tabela Utilizador (em background, após a resposta)
+        utilizador_data = {
+            "email": user_data.email,
+            "password": user_data.password,  # Nota: em produção, considere usar hash
+            "nome": user_data.name,
+        }
+        background_tasks.add_task(insert_utilizador_with_retry, utilizador_data)
         
         user_response = UserResponse(
             id=auth_response.user.id,
@@ -101,7 +131,7 @@ async def create_account(user_data: UserCreate):
     """
     try:
         # Criar usuário no Supabase Auth
-        auth_response = supabase.auth.sign_up({
+        auth_response = await get_auth_pool().run(lambda auth: auth.sign_up({
             "email": user_data.email,
             "password": user_data.password,
             "options": {
@@ -112,7 +142,7 @@ async def create_account(user_data: UserCreate):
                     # "avatar_url": user_data.avatar_url,
                 }
             }
-        })
+        }))
         
         if not auth_response.user:
             raise HTTPException(
@@ -164,11 +194,17 @@ async def login(credentials: LoginRequest):
     Realiza login do usuário
     """
     try:
+        # Estado do perfil: da cache ou, se faltar, consultado em paralelo com o sign-in
+        profile = get_profile_cache().get(credentials.email)
+        profile_task = None
+        if profile is None:
+            profile_task = asyncio.ensure_future(run_in_threadpool(fetch_profile_status, credentials.email))
+        
         # Fazer login no Supabase Auth
-        auth_response = supabase.auth.sign_in_with_password({
+        auth_response = await get_auth_pool().run(lambda auth: auth.sign_in_with_password({
             "email": credentials.email,
             "password": credentials.password
-        })
+        }))
         
         if not auth_response.user or not auth_response.session:
             raise HTTPException(
@@ -176,22 +212,15 @@ async def login(credentials: LoginRequest):
                 detail="Credenciais inválidas"
             )
         
-        # Buscar dados adicionais do usuário na tabela Utilizador
-        # E verificar se o perfil está completo
-        profile_complete = False
-        try:
-            utilizador_response = supabase.table("Utilizador").select("*").eq("email", credentials.email).execute()
-            
-            if utilizador_response.data and len(utilizador_response.data) > 0:
-                nome = utilizador_response.data[0].get("nome", auth_response.user.user_metadata.get("name", ""))
-                profile_complete = True
-            else:
-                nome = auth_response.user.user_metadata.get("name", "")
-                profile_complete = False
-        except Exception as e:
-            print(f"Aviso: Erro ao buscar dados do Utilizador: {str(e)}")
+        if profile_task is not None:
+            profile = await profile_task
+        
+        # Perfil completo se existir registo na tabela Utilizador
+        profile_complete = bool(profile and profile.exists)
+        if profile_complete and profile.nome:
+            nome = profile.nome
+        else:
             nome = auth_response.user.user_metadata.get("name", "")
-            profile_complete = False
         
         user_response = UserResponse(
             id=auth_response.user.id,
@@ -222,8 +251,67 @@ async def login(credentials: LoginRequest):
         )
 
 
+@router.post("/refresh", response_model=LoginResponse)
+async def refresh(data: RefreshRequest):
+    """
+    Renova a sessão a partir do refresh token, sem pedir a senha de novo
+    
+    O estado do perfil (profile_complete e nome) vem da cache usada no login.
+    """
+    try:
+        auth_response = await get_auth_pool().run(lambda auth: auth.refresh_session(data.refresh_token))
+        
+        if not auth_response.user or not auth_response.session:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Refresh token inválido ou expirado"
+            )
+        
+        email = auth_response.user.email
+        profile = get_profile_cache().get(email)
+        if profile is None:
+            profile = await run_in_threadpool(fetch_profile_status, email)
+        
+        profile_complete = bool(profile and profile.exists)
+        if profile_complete and profile.nome:
+            nome = profile.nome
+        else:
+            nome = auth_response.user.user_metadata.get("name", "")
+        
+        user_response = UserResponse(
+            id=auth_response.user.id,
+            email=email,
+            name=nome,
+            created_at=auth_response.user.created_at
+        )
+        
+        return LoginResponse(
+            user=user_response,
+            access_token=auth_response.session.access_token,
+            refresh_token=auth_response.session.refresh_token,
+            expires_in=auth_response.session.expires_in,
+            token_type="bearer",
+            message="Sessão renovada com sucesso",
+            profile_complete=profile_complete
+        )
+        
+    except HTTPException:
+        raise
+    except AuthError:
+        # Inclui AuthSessionMissingError, que não é um AuthApiError
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token inválido ou expirado"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao renovar sessão: {str(e)}"
+        )
+
+
 @router.post("/logout")
-async def logout():
+async def logout(authorization: str = Header(None)):
     """
     Realiza logout do usuário
     
@@ -233,7 +321,14 @@ async def logout():
     3. Limpar o token localmente
     """
     try:
-        supabase.auth.sign_out()
+        if authorization and authorization.startswith("Bearer "):
+            token = authorization[7:]
+            revoke_token(token)
+            # Revogar só a sessão deste token (as outras sessões do utilizador continuam)
+            try:
+                await get_auth_pool().run(lambda auth: auth.admin.sign_out(token, scope="local"))
+            except AuthApiError:
+                pass  # Sessão já inválida ou expirada
         return {"message": "Logout realizado com sucesso"}
     except Exception as e:
         raise HTTPException(
@@ -242,35 +337,20 @@ async def logout():
         )
 
 
-@router.get("/me", response_model=UserResponse)
-async def get_current_user():
+@router.get("/me", response_model=CurrentUserResponse)
+async def get_current_user(user: AuthenticatedUser = Depends(get_current_principal)):
     """
     Retorna dados do usuário atual (requer autenticação)
     
     Para usar este endpoint, envie o access_token no header:
     Authorization: Bearer {access_token}
     
-    Nota: Este é um exemplo básico. Para produção, implemente
-    middleware de autenticação adequado.
+    O token é verificado localmente e o resultado fica em cache até expirar.
     """
-    try:
-        user = supabase.auth.get_user()
-        
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Não autenticado"
-            )
-        
-        return UserResponse(
-            id=user.user.id,
-            email=user.user.email,
-            name=user.user.user_metadata.get("name", ""),
-            created_at=user.user.created_at
-        )
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token inválido ou expirado"
-        )
+    return CurrentUserResponse(
+        id=user.id,
+        email=user.email,
+        name=user.user_metadata.get("name", ""),
+        expires_at=user.expires_at,
+        profile_complete=user.profile_complete
+    )
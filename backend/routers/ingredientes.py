@@ -1,6 +1,12 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, status
 from typing import List, Dict, Any
 from database import get_supabase_client
+from config import get_settings
+from sync import fetch_changes
+from inventory_cache import get_inventory_cache, get_inventory_snapshot
+from write_buffer import get_write_buffer
+from responses import FastJSONResponse
+from response_cache import get_response_cache, cached_response, cache_response
 import json
 
 router = APIRouter()
@@ -217,14 +223,20 @@ async def debug_valid_food_groups():
 
 
 @router.get("")
-async def get_ingredientes():
+async def get_ingredientes(request: Request):
     """
     Retorna todos os ingredientes com suas informações completas
     """
     try:
+        # Resposta já serializada em cache
+        cache_key = get_response_cache().key(request, "ingredientes")
+        cached = cached_response(request, cache_key)
+        if cached is not None:
+            return cached
+        
         supabase = get_supabase_client()
         response = supabase.table("Ingrediente").select("*").execute()
-        return response.data
+        return cache_response(request, cache_key, response.data)
         
     except Exception as e:
         raise HTTPException(
@@ -277,6 +289,8 @@ async def create_ingrediente(ingredient_data: Dict[str, Any]):
         print(f"Supabase response: {response}")
         
         if response.data and len(response.data) > 0:
+            # A lista de ingredientes em cache deixou de estar atualizada
+            get_response_cache().bump("ingredientes")
             return response.data[0]
         
         raise HTTPException(
@@ -318,24 +332,18 @@ async def get_user_inventory(user_email: str):
     try:
         supabase = get_supabase_client()
         
+        fill_token = get_inventory_cache().begin_fill()
         response = supabase.table("Inventário").select(
             "idIngrediente, idUtilizador, quantidade, Ingrediente(id, nome, grupo_alimentar, unidade_medida, calorias)"
         ).eq("idUtilizador", user_email).execute()
+        apply_pending_quantities(user_email, response.data)
+        
+        # Aproveitar a leitura completa para aquecer a cache de snapshots
+        get_inventory_cache().put(user_email, {
+            item["idIngrediente"]: item.get("quantidade") or 0 for item in response.data
+        }, fill_token)
         
-        inventory = []
-        for item in response.data:
-            if item.get('Ingrediente'):
-                inventory.append({
-                    "idIngrediente": item["idIngrediente"],
-                    "quantidade": item["quantidade"],
-                    "id": item["Ingrediente"]["id"],
-                    "nome": item["Ingrediente"]["nome"],
-                    "grupo_alimentar": item["Ingrediente"]["grupo_alimentar"],
-                    "unidade_medida": item["Ingrediente"]["unidade_medida"],
-                    "calorias": item["Ingrediente"]["calorias"]
-                })
-        
-        return inventory
+        return FastJSONResponse([format_inventory_item(item) for item in response.data if item.get('Ingrediente')])
         
     except Exception as e:
         raise HTTPException(
@@ -344,6 +352,70 @@ async def get_user_inventory(user_email: str):
         )
 
 
+@router.get("/inventario/{user_email}/changes")
+async def get_user_inventory_changes(user_email: str, since: str = None):
+    """
+    Retorna apenas as alterações do inventário desde a última sincronização
+    
+    Parâmetros:
+        - since: cursor devolvido na sincronização anterior (opcional)
+    
+    Retorna:
+        - cursor: cursor a enviar no próximo pedido
+        - full: true se o cliente deve substituir o inventário local por "upserts"
+        - upserts: itens inseridos ou alterados (mesmo formato de GET /inventario)
+        - deletes: IDs dos ingredientes removidos
+    """
+    try:
+        supabase = get_supabase_client()
+        
+        # Alterações lidas da base de dados (updated_at e SyncRemovido)
+        changes = fetch_changes(
+            supabase,
+            "Inventário",
+            "idIngrediente, idUtilizador, quantidade, Ingrediente(id, nome, grupo_alimentar, unidade_medida, calorias)",
+            user_email,
+            since
+        )
+        apply_pending_quantities(user_email, changes["rows"])
+        
+        return {
+            "cursor": changes["cursor"],
+            "full": changes["full"],
+            "upserts": [format_inventory_item(item) for item in changes["rows"] if item.get('Ingrediente')],
+            "deletes": changes["deletes"]
+        }
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao sincronizar frigorífico: {str(e)}"
+        )
+
+
+def apply_pending_quantities(user_email: str, rows: List[Dict[str, Any]]):
+    """Aplica as quantidades ainda no buffer de escrita sobre linhas lidas do Inventário"""
+    pending = get_write_buffer().pending_for_user(user_email)
+    if not pending:
+        return
+    for row in rows:
+        if row["idIngrediente"] in pending:
+            row["quantidade"] = pending[row["idIngrediente"]]
+
+
+def format_inventory_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Converte uma linha de Inventário (com JOIN de Ingrediente) para a resposta da API"""
+    return {
+        "idIngrediente": item["idIngrediente"],
+        "quantidade": item["quantidade"],
+        "id": item["Ingrediente"]["id"],
+        "nome": item["Ingrediente"]["nome"],
+        "grupo_alimentar": item["Ingrediente"]["grupo_alimentar"],
+        "unidade_medida": item["Ingrediente"]["unidade_medida"],
+        "calorias": item["Ingrediente"]["calorias"]
+    }
+
+
 @router.post("/inventario")
 async def add_to_inventory(inventory_item: Dict[str, Any]):
     """
@@ -367,6 +439,9 @@ async def add_to_inventory(inventory_item: Dict[str, Any]):
                 detail="idUtilizador e idIngrediente são obrigatórios"
             )
         
+        # Gravar primeiro uma quantidade pendente no buffer, para somar sobre ela
+        get_write_buffer().flush_key(id_utilizador, int(id_ingrediente))
+        
         # Check if item already exists in inventory
         existing = supabase.table("Inventário").select("*").eq(
             "idUtilizador", id_utilizador
@@ -382,11 +457,14 @@ async def add_to_inventory(inventory_item: Dict[str, Any]):
             ).execute()
         else:
             # Insert new item
+            new_quantity = quantidade
             response = supabase.table("Inventário").insert({
                 "idUtilizador": id_utilizador,
                 "idIngrediente": id_ingrediente,
                 "quantidade": quantidade
             }).execute()
+        
+        get_inventory_cache().set_quantity(id_utilizador, int(id_ingrediente), new_quantity)
                 
         return {
             "message": "Item adicionado ao inventário com sucesso",
@@ -425,6 +503,29 @@ async def update_inventory_quantity(inventory_update: Dict[str, Any]):
                 detail="idUtilizador, idIngrediente e quantidade são obrigatórios"
             )
         
+        if get_settings().inventory_write_buffer_enabled:
+            # Agrupar toques rápidos em +/- numa única escrita. A snapshot pode
+            # estar desatualizada até inventory_cache_ttl_seconds: se o item já
+            # tiver sido removido, o flush deteta o update sem linhas e descarta-o
+            id_ingrediente = int(id_ingrediente)
+            if id_ingrediente not in get_inventory_snapshot(id_utilizador):
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Item não encontrado no inventário"
+                )
+            
+            get_write_buffer().put(id_utilizador, id_ingrediente, quantidade)
+            get_inventory_cache().set_quantity(id_utilizador, id_ingrediente, quantidade)
+            
+            return {
+                "message": "Quantidade atualizada com sucesso",
+                "data": {
+                    "idUtilizador": id_utilizador,
+                    "idIngrediente": id_ingrediente,
+                    "quantidade": quantidade
+                }
+            }
+        
         # Update the quantity
         response = supabase.table("Inventário").update({
             "quantidade": quantidade
@@ -438,6 +539,8 @@ async def update_inventory_quantity(inventory_update: Dict[str, Any]):
                 detail="Item não encontrado no inventário"
             )
         
+        get_inventory_cache().set_quantity(id_utilizador, int(id_ingrediente), quantidade)
+        
         return {
             "message": "Quantidade atualizada com sucesso",
             "data": response.data[0] if response.data else None
@@ -473,11 +576,16 @@ async def remove_from_inventory(inventory_item: Dict[str, Any]):
                 detail="idUtilizador e idIngrediente são obrigatórios"
             )
         
+        # Uma quantidade pendente no buffer deixa de interessar
+        get_write_buffer().discard(id_utilizador, int(id_ingrediente))
+        
         # Delete the item from inventory
         response = supabase.table("Inventário").delete().eq(
             "idUtilizador", id_utilizador
         ).eq("idIngrediente", id_ingrediente).execute()
         
+        get_inventory_cache().remove(id_utilizador, [int(id_ingrediente)])
+        
         return {
             "message": "Item removido do inventário com sucesso",
             "data": response.data if hasattr(response, 'data') else None
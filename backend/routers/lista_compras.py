@@ -1,7 +1,12 @@
 from fastapi import APIRouter, HTTPException, status
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from collections import defaultdict
 from database import get_supabase_client
-from pydantic import BaseModel
+from sync import fetch_changes
+from inventory_cache import get_inventory_cache, get_inventory_snapshot
+from write_buffer import get_write_buffer
+from pydantic import BaseModel, Field
+import math
 
 router = APIRouter()
 
@@ -19,6 +24,23 @@ class ListaComprasResponse(BaseModel):
     quantidade: int
 
 
+class ReceitaPorcoes(BaseModel):
+    """Receita selecionada e número de porções pretendidas"""
+    idReceita: int
+    porcoes: Optional[int] = Field(None, gt=0)
+
+
+class ListaComprasFromReceitas(BaseModel):
+    """Schema para gerar a lista de compras a partir de receitas"""
+    idUtilizador: str
+    receitas: List[ReceitaPorcoes] = Field(..., min_length=1)
+
+
+class ListaComprasCheckout(BaseModel):
+    """Schema para marcar itens da lista de compras como comprados"""
+    idIngredientes: Optional[List[int]] = None
+
+
 @router.get("/usuario/{user_email}")
 async def get_lista_compras(user_email: str):
     """
@@ -38,23 +60,7 @@ async def get_lista_compras(user_email: str):
             "idIngrediente, idUtilizador, quantidade, Ingrediente(id, nome, grupo_alimentar, unidade_medida, calorias)"
         ).eq("idUtilizador", user_email).execute()
         
-        items = []
-        for item in response.data:
-            if item.get('Ingrediente'):
-                items.append({
-                    "idIngrediente": item["idIngrediente"],
-                    "idUtilizador": item["idUtilizador"],
-                    "quantidade": item["quantidade"],
-                    "ingrediente": {
-                        "id": item["Ingrediente"]["id"],
-                        "nome": item["Ingrediente"]["nome"],
-                        "grupo_alimentar": item["Ingrediente"]["grupo_alimentar"],
-                        "unidade_medida": item["Ingrediente"]["unidade_medida"],
-                        "calorias": item["Ingrediente"]["calorias"]
-                    }
-                })
-        
-        return items
+        return [format_lista_item(item) for item in response.data if item.get('Ingrediente')]
         
     except Exception as e:
         raise HTTPException(
@@ -63,6 +69,63 @@ async def get_lista_compras(user_email: str):
         )
 
 
+@router.get("/usuario/{user_email}/changes")
+async def get_lista_compras_changes(user_email: str, since: str = None):
+    """
+    Retorna apenas as alterações da lista de compras desde a última sincronização
+    
+    Parâmetros:
+        - user_email: Email do usuário (idUtilizador)
+        - since: cursor devolvido na sincronização anterior (opcional)
+    
+    Retorna:
+        - cursor: cursor a enviar no próximo pedido
+        - full: true se o cliente deve substituir a lista local por "upserts"
+        - upserts: itens inseridos ou alterados (mesmo formato de GET /usuario/{email})
+        - deletes: IDs dos ingredientes removidos
+    """
+    try:
+        supabase = get_supabase_client()
+        
+        # Alterações lidas da base de dados (updated_at e SyncRemovido)
+        changes = fetch_changes(
+            supabase,
+            "ListaCompras",
+            "idIngrediente, idUtilizador, quantidade, Ingrediente(id, nome, grupo_alimentar, unidade_medida, calorias)",
+            user_email,
+            since
+        )
+        
+        return {
+            "cursor": changes["cursor"],
+            "full": changes["full"],
+            "upserts": [format_lista_item(item) for item in changes["rows"] if item.get('Ingrediente')],
+            "deletes": changes["deletes"]
+        }
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao sincronizar lista de compras: {str(e)}"
+        )
+
+
+def format_lista_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Converte uma linha de ListaCompras (com JOIN de Ingrediente) para a resposta da API"""
+    return {
+        "idIngrediente": item["idIngrediente"],
+        "idUtilizador": item["idUtilizador"],
+        "quantidade": item["quantidade"],
+        "ingrediente": {
+            "id": item["Ingrediente"]["id"],
+            "nome": item["Ingrediente"]["nome"],
+            "grupo_alimentar": item["Ingrediente"]["grupo_alimentar"],
+            "unidade_medida": item["Ingrediente"]["unidade_medida"],
+            "calorias": item["Ingrediente"]["calorias"]
+        }
+    }
+
+
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def add_to_lista_compras(
     idIngrediente: int,
@@ -138,6 +201,191 @@ async def add_to_lista_compras(
         )
 
 
+@router.post("/from-recipes", status_code=status.HTTP_201_CREATED)
+async def generate_lista_compras_from_recipes(payload: ListaComprasFromReceitas):
+    """
+    Gera a lista de compras a partir de receitas selecionadas
+    
+    Soma as quantidades de ReceitaIngrediente (escaladas pelas porções pedidas),
+    subtrai o que o utilizador já tem no Inventário e grava o que falta na
+    ListaCompras num único upsert. Itens que já estão na lista com quantidade
+    suficiente não são alterados, por isso gerar a lista duas vezes não duplica.
+    
+    Body:
+        - idUtilizador: Email do usuário
+        - receitas: [{"idReceita": 1, "porcoes": 4}, ...]
+          (sem porcoes, usa as porções da própria receita)
+    
+    Retorna:
+        Itens gravados na lista de compras
+    """
+    try:
+        supabase = get_supabase_client()
+        user_email = payload.idUtilizador
+        receita_ids = list({r.idReceita for r in payload.receitas})
+        
+        # 1. Porções base de todas as receitas numa só query
+        receitas_response = supabase.table("Receita").select(
+            "id, porcoes"
+        ).in_("id", receita_ids).execute()
+        porcoes_base = {r["id"]: r.get("porcoes") for r in (receitas_response.data or [])}
+        
+        missing = [rid for rid in receita_ids if rid not in porcoes_base]
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Receitas não encontradas: {', '.join(str(rid) for rid in missing)}"
+            )
+        
+        # Fator de escala por receita (porções pedidas / porções da receita)
+        fatores = defaultdict(float)
+        for receita in payload.receitas:
+            base = porcoes_base.get(receita.idReceita)
+            if receita.porcoes is None or not base:
+                fatores[receita.idReceita] += 1
+            else:
+                fatores[receita.idReceita] += receita.porcoes / base
+        
+        # 2. Ingredientes de todas as receitas numa só query
+        rec_ing_response = supabase.table("ReceitaIngrediente").select(
+            "idReceita, idIngrediente, quantidade"
+        ).in_("idReceita", receita_ids).execute()
+        
+        necessario = defaultdict(float)
+        for rec_ing in (rec_ing_response.data or []):
+            necessario[rec_ing["idIngrediente"]] += (
+                (rec_ing.get("quantidade") or 0) * fatores[rec_ing["idReceita"]]
+            )
+        
+        if not necessario:
+            return {
+                "message": "Nenhum ingrediente em falta",
+                "idUtilizador": user_email,
+                "itens": [],
+                "total_itens": 0
+            }
+        
+        ingrediente_ids = list(necessario.keys())
+        
+        # 3. Inventário (da cache) e lista de compras atual dos ingredientes necessários
+        em_casa = get_inventory_snapshot(user_email)
+        
+        lista_response = supabase.table("ListaCompras").select(
+            "idIngrediente, quantidade"
+        ).eq("idUtilizador", user_email).in_("idIngrediente", ingrediente_ids).execute()
+        na_lista = {
+            item["idIngrediente"]: item.get("quantidade") or 0
+            for item in (lista_response.data or [])
+        }
+        
+        # 4. Calcular o que falta
+        rows = []
+        for id_ingrediente, quantidade in necessario.items():
+            falta = math.ceil(round(quantidade - em_casa.get(id_ingrediente, 0), 6))
+            if falta <= 0 or na_lista.get(id_ingrediente, 0) >= falta:
+                continue
+            rows.append({
+                "idIngrediente": id_ingrediente,
+                "idUtilizador": user_email,
+                "quantidade": falta
+            })
+        
+        # 5. Gravar tudo num único upsert
+        if rows:
+            supabase.table("ListaCompras").upsert(
+                rows, on_conflict="idIngrediente,idUtilizador"
+            ).execute()
+        
+        return {
+            "message": "Lista de compras gerada a partir das receitas",
+            "idUtilizador": user_email,
+            "itens": rows,
+            "total_itens": len(rows)
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao gerar lista de compras: {str(e)}"
+        )
+
+
+@router.post("/usuario/{user_email}/checkout")
+async def checkout_lista_compras(user_email: str, payload: Optional[ListaComprasCheckout] = None):
+    """
+    Marca itens da lista de compras como comprados e passa-os para o Inventário
+    
+    As quantidades são somadas às que já existem no Inventário. A transferência
+    é feita pela função checkout_lista_compras da base de dados
+    (sql/002_checkout_lista_compras.sql): o delete na ListaCompras e o upsert
+    no Inventário correm na mesma transação, somando sobre a quantidade atual.
+    
+    Parâmetros:
+        - user_email: Email do usuário
+        - idIngredientes: IDs a transferir (opcional, sem ele transfere todos)
+    
+    Retorna:
+        Itens transferidos com a nova quantidade no inventário
+    """
+    try:
+        supabase = get_supabase_client()
+        selecionados = payload.idIngredientes if payload else None
+        
+        if selecionados is not None and len(selecionados) == 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="idIngredientes não pode ser vazio"
+            )
+        
+        # 1. Gravar antes as quantidades pendentes no buffer: o flush escreve
+        # valores absolutos e apagaria a soma feita pelo checkout
+        get_write_buffer().flush_user(user_email)
+        
+        # 2. Transferir numa única transação
+        response = supabase.rpc("checkout_lista_compras", {
+            "p_utilizador": user_email,
+            "p_ingredientes": selecionados
+        }).execute()
+        
+        rows = [
+            {
+                "idUtilizador": item["idUtilizador"],
+                "idIngrediente": item["idIngrediente"],
+                "quantidade": item["quantidade"]
+            }
+            for item in (response.data or [])
+        ]
+        
+        if not rows:
+            return {
+                "message": "Nenhum item para transferir",
+                "idUtilizador": user_email,
+                "itens": [],
+                "total_itens": 0
+            }
+        
+        get_inventory_cache().set_quantities(
+            user_email, {row["idIngrediente"]: row["quantidade"] for row in rows}
+        )
+        
+        return {
+            "message": "Itens transferidos para o inventário",
+            "idUtilizador": user_email,
+            "itens": rows,
+            "total_itens": len(rows)
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao finalizar compras: {str(e)}"
+        )
+
+
 @router.delete("/item/{id_ingrediente}/{user_email}", status_code=status.HTTP_200_OK)
 async def remove_from_lista_compras(id_ingrediente: int, user_email: str):
     """
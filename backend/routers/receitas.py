@@ -1,6 +1,9 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, status
 from typing import List, Dict, Any
 from database import get_supabase_client
+from inventory_cache import get_inventory_snapshot
+from response_cache import get_response_cache, cached_response, cache_response
+from singleflight import get_singleflight
 
 router = APIRouter()
 
@@ -41,53 +44,66 @@ async def test_receitas_table():
     return results
 
 
-@router.get("")
-async def get_receitas():
-    """
-    Retorna todas as receitas com suas informações completas incluindo calorias totais
-    """
-    try:
-        supabase = get_supabase_client()
-        response = supabase.table("Receita").select("*").execute()
-        receitas = response.data or []
+def load_receitas() -> List[Dict[str, Any]]:
+    """Lê todas as receitas e calcula as calorias totais de cada uma"""
+    supabase = get_supabase_client()
+    response = supabase.table("Receita").select("*").execute()
+    receitas = response.data or []
+    
+    # Para cada receita, buscar as calorias totais
+    receitas_com_calorias = []
+    for receita in receitas:
+        receita_id = receita.get("id")
         
-        # Para cada receita, buscar as calorias totais
-        receitas_com_calorias = []
-        for receita in receitas:
-            receita_id = receita.get("id")
+        try:
+            # Buscar ingredientes desta receita
+            ingredients_response = supabase.table("ReceitaIngrediente").select("*").eq("idReceita", receita_id).execute()
+            recipe_ingredients = ingredients_response.data or []
             
-            try:
-                # Buscar ingredientes desta receita
-                ingredients_response = supabase.table("ReceitaIngrediente").select("*").eq("idReceita", receita_id).execute()
-                recipe_ingredients = ingredients_response.data or []
+            # Calcular total de calorias
+            total_calorias = 0
+            for rec_ing in recipe_ingredients:
+                ingredient_id = rec_ing.get("idIngrediente")
+                quantidade = rec_ing.get("quantidade", 0)
                 
-                # Calcular total de calorias
-                total_calorias = 0
-                for rec_ing in recipe_ingredients:
-                    ingredient_id = rec_ing.get("idIngrediente")
-                    quantidade = rec_ing.get("quantidade", 0)
+                try:
+                    # Buscar ingrediente completo
+                    ing_response = supabase.table("Ingrediente").select("*").eq("id", ingredient_id).single().execute()
+                    ingredient = ing_response.data
                     
-                    try:
-                        # Buscar ingrediente completo
-                        ing_response = supabase.table("Ingrediente").select("*").eq("id", ingredient_id).single().execute()
-                        ingredient = ing_response.data
-                        
-                        if ingredient:
-                            calorias_por_unidade = (ingredient.get("calorias") or ingredient.get("calories") or 0) / 100
-                            total_calorias += quantidade * calorias_por_unidade
-                    except:
-                        # Se falhar ao buscar ingrediente, continua
-                        pass
-                
-                # Adicionar calorias totais à receita
-                receita["calorias_totais"] = total_calorias
-            except:
-                # Se falhar ao buscar ingredientes, deixa sem calorias
-                receita["calorias_totais"] = 0
+                    if ingredient:
+                        calorias_por_unidade = (ingredient.get("calorias") or ingredient.get("calories") or 0) / 100
+                        total_calorias += quantidade * calorias_por_unidade
+                except:
+                    # Se falhar ao buscar ingrediente, continua
+                    pass
             
-            receitas_com_calorias.append(receita)
+            # Adicionar calorias totais à receita
+            receita["calorias_totais"] = total_calorias
+        except:
+            # Se falhar ao buscar ingredientes, deixa sem calorias
+            receita["calorias_totais"] = 0
         
-        return receitas_com_calorias
+        receitas_com_calorias.append(receita)
+    
+    return receitas_com_calorias
+
+
+@router.get("")
+async def get_receitas(request: Request):
+    """
+    Retorna todas as receitas com suas informações completas incluindo calorias totais
+    """
+    try:
+        # Resposta já serializada em cache
+        cache_key = get_response_cache().key(request, "receitas")
+        cached = cached_response(request, cache_key)
+        if cached is not None:
+            return cached
+        
+        # Pedidos simultâneos partilham a mesma leitura
+        receitas_com_calorias = await get_singleflight().do("receitas", load_receitas)
+        return cache_response(request, cache_key, receitas_com_calorias)
         
     except Exception as e:
         raise HTTPException(
@@ -393,6 +409,64 @@ async def get_outras_receitas(user_email: str = None):
         )
 
 
+def load_recipe_with_ingredients(recipe_id: int) -> Dict[str, Any]:
+    """
+    Lê uma receita com os ingredientes e calorias
+
+    Raises:
+        HTTPException: 404 se a receita não existir
+    """
+    supabase = get_supabase_client()
+    
+    # 1. Buscar a receita
+    recipe_response = supabase.table("Receita").select("*").eq("id", recipe_id).single().execute()
+    recipe = recipe_response.data
+    
+    if not recipe:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Receita não encontrada"
+        )
+    
+    # 2. Buscar ingredientes desta receita na tabela ReceitaIngrediente
+    ingredients_response = supabase.table("ReceitaIngrediente").select("*").eq("idReceita", recipe_id).execute()
+    recipe_ingredients = ingredients_response.data or []
+    
+    # 3. Para cada ingrediente, buscar os detalhes completos na tabela Ingrediente
+    ingredients_with_details = []
+    for rec_ing in recipe_ingredients:
+        ingredient_id = rec_ing.get("idIngrediente")
+        quantidade = rec_ing.get("quantidade")
+        
+        # Buscar ingrediente completo
+        ing_response = supabase.table("Ingrediente").select("*").eq("id", ingredient_id).single().execute()
+        ingredient = ing_response.data
+        
+        if ingredient:
+            calorias_por_unidade = (ingredient.get("calorias") or ingredient.get("calories") or 0) / 100
+            ingredients_with_details.append({
+                "id": ingredient.get("id"),
+                "nome": ingredient.get("nome") or ingredient.get("name"),
+                "quantidade": quantidade,
+                "calorias": calorias_por_unidade,
+                "unidade": ingredient.get("unidade_medida") or ingredient.get("unidade") or "g"  # Usa a unidade do ingrediente
+            })
+    
+    # 4. Calcular total de calorias (quantidade * calorias por unidade)
+    total_calorias = sum(
+        ing.get("quantidade", 0) * ing.get("calorias", 0)
+        for ing in ingredients_with_details
+    )
+    
+    # 5. Retornar receita com ingredientes agregados
+    return {
+        **recipe,
+        "ingredientes": ingredients_with_details,
+        "calorias_totais": total_calorias,
+        "num_ingredientes": len(ingredients_with_details)
+    }
+
+
 @router.get("/{recipe_id}")
 async def get_recipe_with_ingredients(recipe_id: int):
     """
@@ -401,55 +475,8 @@ async def get_recipe_with_ingredients(recipe_id: int):
     E depois busca as calorias de cada ingrediente na tabela Ingrediente
     """
     try:
-        supabase = get_supabase_client()
-        
-        # 1. Buscar a receita
-        recipe_response = supabase.table("Receita").select("*").eq("id", recipe_id).single().execute()
-        recipe = recipe_response.data
-        
-        if not recipe:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Receita não encontrada"
-            )
-        
-        # 2. Buscar ingredientes desta receita na tabela ReceitaIngrediente
-        ingredients_response = supabase.table("ReceitaIngrediente").select("*").eq("idReceita", recipe_id).execute()
-        recipe_ingredients = ingredients_response.data or []
-        
-        # 3. Para cada ingrediente, buscar os detalhes completos na tabela Ingrediente
-        ingredients_with_details = []
-        for rec_ing in recipe_ingredients:
-            ingredient_id = rec_ing.get("idIngrediente")
-            quantidade = rec_ing.get("quantidade")
-            
-            # Buscar ingrediente completo
-            ing_response = supabase.table("Ingrediente").select("*").eq("id", ingredient_id).single().execute()
-            ingredient = ing_response.data
-            
-            if ingredient:
-                calorias_por_unidade = (ingredient.get("calorias") or ingredient.get("calories") or 0) / 100
-                ingredients_with_details.append({
-                    "id": ingredient.get("id"),
-                    "nome": ingredient.get("nome") or ingredient.get("name"),
-                    "quantidade": quantidade,
-                    "calorias": calorias_por_unidade,
-                    "unidade": ingredient.get("unidade_medida") or ingredient.get("unidade") or "g"  # Usa a unidade do ingrediente
-                })
-        
-        # 4. Calcular total de calorias (quantidade * calorias por unidade)
-        total_calorias = sum(
-            ing.get("quantidade", 0) * ing.get("calorias", 0)
-            for ing in ingredients_with_details
-        )
-        
-        # 5. Retornar receita com ingredientes agregados
-        return {
-            **recipe,
-            "ingredientes": ingredients_with_details,
-            "calorias_totais": total_calorias,
-            "num_ingredientes": len(ingredients_with_details)
-        }
+        # Pedidos simultâneos da mesma receita partilham a mesma leitura
+        return await get_singleflight().do(f"receitas/{recipe_id}", load_recipe_with_ingredients, recipe_id)
         
     except HTTPException:
         raise
@@ -542,14 +569,8 @@ async def get_outras_receitas_filtradas(
         # Filtrar por ingredientes do usuário se solicitado
         if only_my_ingredients and user_email:
             try:
-                # Buscar ingredientes do usuário
-                user_ing_response = (
-                    supabase.table("Inventário")
-                    .select("idIngrediente")
-                    .eq("idUtilizador", user_email)
-                    .execute()
-                )
-                user_ingredient_ids = set(r.get("idIngrediente") for r in (user_ing_response.data or []))
+                # Buscar ingredientes do usuário (snapshot em cache)
+                user_ingredient_ids = set(get_inventory_snapshot(user_email))
                 
                 if user_ingredient_ids:
                     # Filtrar receitas que só usam ingredientes do usuário
@@ -1,6 +1,9 @@
 from fastapi import APIRouter, HTTPException, status
 from typing import Dict, Any
 from database import get_supabase_client
+from security import get_token_cache
+from profile_cache import get_profile_cache
+from email_filter import get_email_filter
 
 router = APIRouter()
 
@@ -75,23 +78,6 @@ async def update_utilizador(email: str, data: Dict[str, Any]):
     try:
         supabase = get_supabase_client()
         
-        # Validar valores de enum se fornecidos
-        if "sexo" in data and data["sexo"]:
-            valid_sexos = [opt["value"] for opt in SEXO_OPTIONS]
-            if data["sexo"] not in valid_sexos:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Sexo inválido. Valores aceitos: {', '.join(valid_sexos)}"
-                )
-        
-        if "alimentacao" in data and data["alimentacao"]:
-            valid_alimentacoes = [opt["value"] for opt in ALIMENTACAO_OPTIONS]
-            if data["alimentacao"] not in valid_alimentacoes:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Alimentação inválida. Valores aceitos: {', '.join(valid_alimentacoes)}"
-                )
-        
         # Preparar dados para atualizar
         update_data = {}
         if "nome" in data:
@@ -109,19 +95,42 @@ async def update_utilizador(email: str, data: Dict[str, Any]):
         if "tipo_alimentacao" in data:  # Alias para compatibilidade
             update_data["alimentacao"] = data["tipo_alimentacao"]
         
-        # Atualizar no banco de dados
-        response = supabase.table("Utilizador").update(update_data).eq("email", email).execute()
+        # Validar valores de enum antes de ir à base de dados (inclui o alias)
+        if update_data.get("sexo"):
+            valid_sexos = [opt["value"] for opt in SEXO_OPTIONS]
+            if update_data["sexo"] not in valid_sexos:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Sexo inválido. Valores aceitos: {', '.join(valid_sexos)}"
+                )
+        
+        if update_data.get("alimentacao"):
+            valid_alimentacoes = [opt["value"] for opt in ALIMENTACAO_OPTIONS]
+            if update_data["alimentacao"] not in valid_alimentacoes:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Alimentação inválida. Valores aceitos: {', '.join(valid_alimentacoes)}"
+                )
         
-        if not response.data or len(response.data) == 0:
-            # Se não encontrar, pode ser que o utilizador não exista, então insere
-            insert_data = {"email": email}
-            insert_data.update(update_data)
-            response = supabase.table("Utilizador").insert(insert_data).execute()
+        # Atualizar ou criar o perfil numa única chamada (só as colunas enviadas)
+        upsert_data = {"email": email}
+        upsert_data.update(update_data)
+        # Antes da escrita: o filtro de emails nunca pode dizer "não" a um perfil existente
+        get_email_filter().add(email)
+        response = supabase.table("Utilizador").upsert(upsert_data, on_conflict="email").execute()
+        
+        # Tokens em cache podem ainda ter profile_complete=False
+        cached = get_profile_cache().get(email)
+        if cached is None or not cached.exists:
+            get_token_cache().invalidate_email(email)
+        
+        saved = response.data[0] if response.data else upsert_data
+        get_profile_cache().set(email, True, saved.get("nome"))
         
         return {
             "status": "success",
             "message": "Perfil atualizado com sucesso",
-            "data": response.data[0] if response.data else insert_data
+            "data": saved
         }
     
     except HTTPException:
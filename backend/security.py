@@ -0,0 +1,77 @@
+from functools import lru_cache
+from typing import Optional
+
+from fastapi import Header
+
+from nomnom_common.security import (
+    AuthenticatedUser,
+    Authenticator,
+    TokenCache,
+    TokenVerifier,
+)
+
+from config import get_settings
+from database import get_auth_pool, get_supabase_client
+
+
+@lru_cache()
+def get_token_verifier() -> TokenVerifier:
+    """Retorna o verificador de tokens (cached)"""
+    settings = get_settings()
+    jwks_url = settings.supabase_jwks_url or f"{settings.supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json"
+    return TokenVerifier(
+        jwt_secret=settings.supabase_jwt_secret,
+        jwks_url=jwks_url,
+        audience=settings.supabase_jwt_audience,
+        jwks_cache_seconds=settings.jwks_cache_seconds
+    )
+
+
+@lru_cache()
+def get_token_cache() -> TokenCache:
+    """Retorna a cache de tokens verificados (cached)"""
+    settings = get_settings()
+    return TokenCache(
+        max_entries=settings.token_cache_max_entries,
+        incomplete_profile_seconds=settings.token_cache_incomplete_profile_seconds
+    )
+
+
+def _load_profile_complete(email: Optional[str]) -> Optional[bool]:
+    """Verifica se existe perfil na tabela Utilizador (None se a consulta falhar)"""
+    if not email:
+        return False
+    try:
+        response = get_supabase_client().table("Utilizador").select("email").eq("email", email).limit(1).execute()
+        return bool(response.data)
+    except Exception as e:
+        print(f"Aviso: Erro ao verificar perfil de utilizador: {str(e)}")
+        return None
+
+
+@lru_cache()
+def get_authenticator() -> Authenticator:
+    """Retorna o autenticador dos pedidos (cached)"""
+    return Authenticator(
+        verifier=get_token_verifier(),
+        cache=get_token_cache(),
+        auth_pool=get_auth_pool(),
+        load_profile_complete=_load_profile_complete
+    )
+
+
+def revoke_token(token: str):
+    """Revoga o token neste processo até ao seu `exp` (logout)"""
+    get_authenticator().revoke(token)
+
+
+async def get_current_principal(authorization: str = Header(None)) -> AuthenticatedUser:
+    """
+    Dependência FastAPI que autentica o pedido pelo Bearer token
+
+    Uso:
+        @router.get("/rota")
+        async def rota(user: AuthenticatedUser = Depends(get_current_principal)):
+            ...
+    """
+    return await get_authenticator().authenticate(authorization)
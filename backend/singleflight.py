@@ -0,0 +1,54 @@
+import asyncio
+from functools import lru_cache
+from typing import Any, Callable, Dict
+
+from starlette.concurrency import run_in_threadpool
+
+
+class SingleFlight:
+    """
+    Agrupa leituras idênticas em curso numa única execução
+
+    O primeiro pedido de uma chave (o líder) executa a função no threadpool;
+    os pedidos que chegam com a mesma chave enquanto ela corre esperam pelo
+    mesmo resultado (ou pela mesma exceção). Nada fica guardado depois de
+    terminar: isso é trabalho das caches.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: str, fn: Callable[..., Any], *args) -> Any:
+        """Executa fn(*args) uma vez por chave em simultâneo e partilha o resultado"""
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(run_in_threadpool(fn, *args))
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+            self.leaders += 1
+        else:
+            self.followers += 1
+        # shield: um cliente que desliga não cancela a execução dos outros
+        return await asyncio.shield(future)
+
+    def _forget(self, key: str, future: asyncio.Future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if not future.cancelled():
+            # Evita o aviso "exception was never retrieved" sem seguidores
+            future.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
+
+
+@lru_cache()
+def get_singleflight() -> SingleFlight:
+    """Retorna o agrupador de leituras em curso (cached)"""
+    return SingleFlight()
@@ -0,0 +1,76 @@
+-- Sincronização por deltas do Inventário e da ListaCompras
+--
+-- Cada linha guarda quando foi escrita pela última vez (updated_at) e cada
+-- remoção deixa uma lápide em SyncRemovido. As rotas /changes respondem com
+-- updated_at/removido_em > cursor, por isso veem também as escritas feitas
+-- por outros workers, outras réplicas ou diretamente no Supabase.
+--
+-- Correr uma vez no SQL Editor do Supabase.
+
+-- 1. Momento da última escrita de cada linha
+ALTER TABLE "Inventário" ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT clock_timestamp();
+ALTER TABLE "ListaCompras" ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT clock_timestamp();
+
+CREATE INDEX IF NOT EXISTS "Inventário_idUtilizador_updated_at_idx"
+    ON "Inventário" ("idUtilizador", updated_at);
+CREATE INDEX IF NOT EXISTS "ListaCompras_idUtilizador_updated_at_idx"
+    ON "ListaCompras" ("idUtilizador", updated_at);
+
+-- 2. Lápides das linhas removidas (uma por tabela/utilizador/ingrediente)
+CREATE TABLE IF NOT EXISTS "SyncRemovido" (
+    tabela text NOT NULL,
+    "idUtilizador" text NOT NULL,
+    "idIngrediente" bigint NOT NULL,
+    removido_em timestamptz NOT NULL DEFAULT clock_timestamp(),
+    PRIMARY KEY (tabela, "idUtilizador", "idIngrediente")
+);
+
+CREATE INDEX IF NOT EXISTS "SyncRemovido_tabela_idUtilizador_removido_em_idx"
+    ON "SyncRemovido" (tabela, "idUtilizador", removido_em);
+
+-- 3. Triggers: carimbar as escritas e registar/limpar as lápides
+CREATE OR REPLACE FUNCTION sync_touch() RETURNS trigger AS $$
+BEGIN
+    -- clock_timestamp() e não now(): fica mais perto do commit da transação
+    NEW.updated_at := clock_timestamp();
+    IF TG_OP = 'INSERT' THEN
+        DELETE FROM "SyncRemovido"
+        WHERE tabela = TG_TABLE_NAME
+          AND "idUtilizador" = NEW."idUtilizador"
+          AND "idIngrediente" = NEW."idIngrediente";
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_tombstone() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO "SyncRemovido" (tabela, "idUtilizador", "idIngrediente", removido_em)
+    VALUES (TG_TABLE_NAME, OLD."idUtilizador", OLD."idIngrediente", clock_timestamp())
+    ON CONFLICT (tabela, "idUtilizador", "idIngrediente")
+    DO UPDATE SET removido_em = EXCLUDED.removido_em;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS sync_touch ON "Inventário";
+CREATE TRIGGER sync_touch BEFORE INSERT OR UPDATE ON "Inventário"
+    FOR EACH ROW EXECUTE FUNCTION sync_touch();
+DROP TRIGGER IF EXISTS sync_tombstone ON "Inventário";
+CREATE TRIGGER sync_tombstone AFTER DELETE ON "Inventário"
+    FOR EACH ROW EXECUTE FUNCTION sync_tombstone();
+
+DROP TRIGGER IF EXISTS sync_touch ON "ListaCompras";
+CREATE TRIGGER sync_touch BEFORE INSERT OR UPDATE ON "ListaCompras"
+    FOR EACH ROW EXECUTE FUNCTION sync_touch();
+DROP TRIGGER IF EXISTS sync_tombstone ON "ListaCompras";
+CREATE TRIGGER sync_tombstone AFTER DELETE ON "ListaCompras"
+    FOR EACH ROW EXECUTE FUNCTION sync_tombstone();
+
+-- 4. Limpeza das lápides antigas (agendar, p.ex. com pg_cron, uma vez por dia).
+-- O intervalo tem de ser >= sync_tombstone_retention_days do backend: cursores
+-- mais antigos do que isso recebem uma sincronização completa.
+CREATE OR REPLACE FUNCTION purge_sync_removido(retencao interval DEFAULT interval '30 days')
+RETURNS void AS $$
+    DELETE FROM "SyncRemovido" WHERE removido_em < clock_timestamp() - retencao;
+$$ LANGUAGE sql;
@@ -0,0 +1,30 @@
+-- Checkout da lista de compras numa única transação
+--
+-- Remove os itens comprados da ListaCompras e soma as quantidades ao
+-- Inventário no mesmo comando: o DELETE ... RETURNING bloqueia as linhas
+-- da lista (dois checkouts concorrentes não transferem o mesmo item duas
+-- vezes) e o ON CONFLICT soma sobre a quantidade atual do Inventário, sem
+-- perder escritas feitas entre a leitura e a escrita.
+--
+-- Chamado pelo backend com supabase.rpc("checkout_lista_compras", ...).
+-- Correr no SQL Editor do Supabase depois de 001_sync_deltas.sql.
+
+CREATE OR REPLACE FUNCTION checkout_lista_compras(
+    p_utilizador text,
+    p_ingredientes bigint[] DEFAULT NULL  -- NULL: todos os itens da lista
+)
+RETURNS SETOF "Inventário"
+LANGUAGE sql
+AS $$
+    WITH comprados AS (
+        DELETE FROM "ListaCompras"
+        WHERE "idUtilizador" = p_utilizador
+          AND (p_ingredientes IS NULL OR "idIngrediente" = ANY (p_ingredientes))
+        RETURNING "idIngrediente", COALESCE(quantidade, 0) AS quantidade
+    )
+    INSERT INTO "Inventário" ("idUtilizador", "idIngrediente", quantidade)
+    SELECT p_utilizador, "idIngrediente", quantidade FROM comprados
+    ON CONFLICT ("idUtilizador", "idIngrediente")
+    DO UPDATE SET quantidade = COALESCE("Inventário".quantidade, 0) + EXCLUDED.quantidade
+    RETURNING *;
+$$;
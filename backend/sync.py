@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from config import get_settings
+
+
+TOMBSTONE_TABLE = "SyncRemovido"
+
+
+def parse_cursor(since: Optional[str]) -> Optional[datetime]:
+    """
+    Momento representado pelo cursor, ou None se o cliente tem de fazer uma
+    sincronização completa (sem cursor, cursor inválido, do futuro ou mais
+    antigo do que as lápides guardadas em SyncRemovido)
+    """
+    if not since:
+        return None
+    try:
+        moment = datetime.fromisoformat(since)
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        return None
+
+    now = datetime.now(timezone.utc)
+    retention = timedelta(days=get_settings().sync_tombstone_retention_days)
+    if moment > now or moment < now - retention:
+        return None
+    return moment
+
+
+def fetch_changes(supabase, table: str, select: str, user_email: str, since: Optional[str]) -> Dict[str, Any]:
+    """
+    Alterações de uma tabela por utilizador (Inventário, ListaCompras)
+    depois do cursor, lidas da base de dados
+
+    As linhas têm updated_at e as remoções ficam em SyncRemovido (triggers
+    de sql/001_sync_deltas.sql), por isso o delta inclui as escritas de
+    todos os workers e réplicas e as feitas diretamente no Supabase.
+
+    O cursor é o início do pedido (relógio do servidor, em UTC). A consulta
+    recua sync_overlap_seconds para apanhar transações que fizeram commit
+    depois com um updated_at anterior ao cursor (e desvios pequenos entre o
+    relógio do servidor e o da base de dados); as linhas repetidas são
+    idempotentes para o cliente.
+
+    Retorna {"cursor", "full", "rows", "deletes"}: com full=True "rows" é a
+    tabela completa do utilizador e "deletes" vem vazio.
+    """
+    cursor = _format_timestamp(datetime.now(timezone.utc))
+    moment = parse_cursor(since)
+
+    query = supabase.table(table).select(f"{select}, updated_at").eq("idUtilizador", user_email)
+
+    if moment is None:
+        return {
+            "cursor": cursor,
+            "full": True,
+            "rows": query.execute().data or [],
+            "deletes": []
+        }
+
+    desde = _format_timestamp(moment - timedelta(seconds=get_settings().sync_overlap_seconds))
+    rows = query.gt("updated_at", desde).execute().data or []
+    removidos = supabase.table(TOMBSTONE_TABLE).select(
+        "idIngrediente, removido_em"
+    ).eq("tabela", table).eq("idUtilizador", user_email).gt("removido_em", desde).execute().data or []
+
+    # Entre as duas consultas a linha pode ter sido removida ou reinserida:
+    # fica a operação mais recente
+    latest_write = {row["idIngrediente"]: _parse_timestamp(row.get("updated_at")) for row in rows}
+    deletes: List[int] = []
+    for removido in removidos:
+        id_ingrediente = removido["idIngrediente"]
+        removido_em = _parse_timestamp(removido.get("removido_em"))
+        written = latest_write.get(id_ingrediente)
+        if written is not None and written >= removido_em:
+            continue
+        latest_write.pop(id_ingrediente, None)
+        deletes.append(id_ingrediente)
+
+    return {
+        "cursor": cursor,
+        "full": False,
+        "rows": [row for row in rows if row["idIngrediente"] in latest_write],
+        "deletes": deletes
+    }
+
+
+def _format_timestamp(moment: datetime) -> str:
+    """ISO 8601 em UTC com "Z" (sem "+", que numa query string não codificada vira espaço)"""
+    return moment.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _parse_timestamp(value: Optional[str]) -> datetime:
+    """Timestamp devolvido pelo PostgREST (timestamptz em ISO 8601)"""
+    if not value:
+        return datetime.min.replace(tzinfo=timezone.utc)
+    return datetime.fromisoformat(value)
@@ -0,0 +1,199 @@
+import asyncio
+import time
+from functools import lru_cache
+from typing import Any, Dict, Tuple
+
+from config import get_settings
+from database import get_supabase_client
+from inventory_cache import get_inventory_cache
+
+MAX_RETRY_DELAY_SECONDS = 30
+
+
+class QuantityWriteBuffer:
+    """
+    Buffer write-behind para as atualizações de quantidade do Inventário.
+
+    Cada toque em +/- no frigorífico substitui a quantidade pendente do par
+    (idUtilizador, idIngrediente); só a última é gravada quando a janela
+    termina. As leituras devem aplicar pending_for_user() por cima dos dados
+    da base de dados para continuarem a ver as próprias escritas.
+
+    Uma escrita que falha volta ao buffer (a menos que já tenha chegado uma
+    quantidade mais recente) e é repetida com backoff exponencial até
+    max_attempts tentativas; depois disso é descartada e a cache do
+    utilizador invalidada. Se o item já não existir na base de dados (update
+    sem linhas), a quantidade é descartada e contada em "missing".
+
+    O buffer vive na memória do processo: as escritas pendentes perdem-se
+    se o processo terminar sem passar pelo shutdown (crash, kill -9), e o
+    flush_all do shutdown é best-effort.
+    """
+
+    def __init__(self, window_seconds: float = 0.5, max_attempts: int = 5):
+        self.window_seconds = window_seconds
+        self.max_attempts = max_attempts
+        self._pending: Dict[Tuple[str, int], Any] = {}
+        self._tasks: Dict[Tuple[str, int], asyncio.Task] = {}
+        self._attempts: Dict[Tuple[str, int], int] = {}
+        self.buffered = 0
+        self.writes = 0
+        self.retries = 0
+        self.dropped = 0
+        self.missing = 0
+
+    def put(self, user: str, id_ingrediente: int, quantidade: Any):
+        """Guarda a nova quantidade e agenda a escrita no fim da janela"""
+        key = (user, id_ingrediente)
+        self._pending[key] = quantidade
+        self.buffered += 1
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.create_task(self._flush_later(key, self.window_seconds))
+
+    def pending_for_user(self, user: str) -> Dict[int, Any]:
+        """Quantidades ainda não gravadas de um utilizador"""
+        return {
+            id_ingrediente: quantidade
+            for (pending_user, id_ingrediente), quantidade in self._pending.items()
+            if pending_user == user
+        }
+
+    def discard(self, user: str, id_ingrediente: int):
+        """Descarta a escrita pendente (ex.: o item vai ser removido)"""
+        key = (user, id_ingrediente)
+        self._pending.pop(key, None)
+        self._attempts.pop(key, None)
+        task = self._tasks.pop(key, None)
+        if task:
+            task.cancel()
+
+    def flush_key(self, user: str, id_ingrediente: int):
+        """
+        Grava já a escrita pendente de um item, se existir
+
+        Raises:
+            Exception: Se a escrita falhar (a quantidade continua no buffer)
+        """
+        key = (user, id_ingrediente)
+        task = self._tasks.pop(key, None)
+        if task:
+            task.cancel()
+        try:
+            self._write(key)
+        except Exception:
+            # Quem pediu o flush ia ler a base de dados: não pode continuar
+            self._schedule_retry(key)
+            raise
+
+    def flush_user(self, user: str):
+        """
+        Grava já todas as escritas pendentes de um utilizador
+
+        Raises:
+            Exception: Se alguma escrita falhar
+        """
+        for key in [key for key in self._pending if key[0] == user]:
+            self.flush_key(*key)
+
+    def flush_all(self):
+        """Grava todas as escritas pendentes, com novas tentativas (usado no shutdown)"""
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+
+        for attempt in range(self.max_attempts):
+            if attempt:
+                time.sleep(self._retry_delay(attempt))
+            for key in list(self._pending):
+                try:
+                    self._write(key)
+                except Exception as e:
+                    print(f"Aviso: Erro ao gravar quantidade pendente de {key[0]}/{key[1]}: {str(e)}")
+            if not self._pending:
+                return
+
+        self.dropped += len(self._pending)
+        print(f"Aviso: {len(self._pending)} quantidades do inventário não foram gravadas no shutdown")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "buffered": self.buffered,
+            "writes": self.writes,
+            "retries": self.retries,
+            "dropped": self.dropped,
+            "missing": self.missing,
+        }
+
+    async def _flush_later(self, key: Tuple[str, int], delay: float):
+        await asyncio.sleep(delay)
+        self._tasks.pop(key, None)
+        try:
+            self._write(key)
+        except Exception as e:
+            print(f"Aviso: Erro ao gravar quantidade pendente de {key[0]}/{key[1]}: {str(e)}")
+            self._schedule_retry(key)
+
+    def _schedule_retry(self, key: Tuple[str, int]):
+        """Volta a agendar a escrita de uma quantidade que falhou, ou desiste dela"""
+        if key not in self._pending or key in self._tasks:
+            return
+        attempts = self._attempts.get(key, 0)
+        if attempts >= self.max_attempts:
+            self._pending.pop(key, None)
+            self._attempts.pop(key, None)
+            self.dropped += 1
+            print(f"Aviso: Quantidade pendente de {key[0]}/{key[1]} descartada após {attempts} tentativas")
+            # A cache deixou de refletir a base de dados
+            get_inventory_cache().invalidate(key[0])
+            return
+        self.retries += 1
+        self._tasks[key] = asyncio.create_task(self._flush_later(key, self._retry_delay(attempts)))
+
+    def _retry_delay(self, attempts: int) -> float:
+        return min(MAX_RETRY_DELAY_SECONDS, self.window_seconds * 2 ** attempts)
+
+    def _write(self, key: Tuple[str, int]):
+        """
+        Grava a quantidade pendente de um item
+
+        Raises:
+            Exception: Se a escrita falhar; a quantidade volta ao buffer se
+            entretanto não tiver chegado uma mais recente
+        """
+        if key not in self._pending:
+            return
+        quantidade = self._pending.pop(key)
+        user, id_ingrediente = key
+        try:
+            supabase = get_supabase_client()
+            response = supabase.table("Inventário").update({
+                "quantidade": quantidade
+            }).eq("idUtilizador", user).eq(
+                "idIngrediente", id_ingrediente
+            ).execute()
+        except Exception:
+            self._pending.setdefault(key, quantidade)
+            self._attempts[key] = self._attempts.get(key, 0) + 1
+            raise
+
+        if key not in self._pending:
+            self._attempts.pop(key, None)
+        self.writes += 1
+        # Snapshots lidos antes deste flush podem ter a quantidade anterior
+        get_inventory_cache().mark_written(user)
+        if not response.data:
+            # O item foi removido entretanto (noutro worker ou fora desta API)
+            self.missing += 1
+            print(f"Aviso: Quantidade pendente de {user}/{id_ingrediente} descartada: item já não existe no inventário")
+            get_inventory_cache().remove(user, [id_ingrediente])
+
+
+@lru_cache()
+def get_write_buffer() -> QuantityWriteBuffer:
+    """Retorna o buffer de escritas de quantidade do inventário (cached)"""
+    settings = get_settings()
+    return QuantityWriteBuffer(
+        window_seconds=settings.inventory_write_buffer_window_ms / 1000,
+        max_attempts=settings.inventory_write_buffer_max_attempts
+    )
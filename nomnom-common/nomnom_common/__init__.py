@@ -0,0 +1 @@
+"""Código partilhado pelos serviços Python do NomNom"""
@@ -0,0 +1,52 @@
+import queue
+from contextlib import contextmanager
+from typing import Callable, Iterator, TypeVar
+
+from gotrue import SyncGoTrueClient
+from starlette.concurrency import run_in_threadpool
+
+T = TypeVar("T")
+
+
+class AuthClientPool:
+    """
+    Pool de clientes do Supabase Auth sem sessão partilhada
+
+    sign_in/sign_up guardam a sessão dentro do cliente, por isso cada pedido
+    usa um cliente em exclusivo e limpa a sessão antes de o devolver. As
+    chamadas correm no threadpool, então logins e registos em paralelo não
+    bloqueiam o event loop nem misturam sessões de utilizadores diferentes.
+    """
+
+    def __init__(self, url: str, key: str, size: int = 8):
+        self._url = f"{url.rstrip('/')}/auth/v1"
+        self._headers = {"apikey": key, "Authorization": f"Bearer {key}"}
+        self._clients: "queue.Queue[SyncGoTrueClient]" = queue.Queue()
+        for _ in range(size):
+            self._clients.put(self._create_client())
+
+    def _create_client(self) -> SyncGoTrueClient:
+        return SyncGoTrueClient(
+            url=self._url,
+            headers=dict(self._headers),
+            persist_session=False,
+            auto_refresh_token=False
+        )
+
+    @contextmanager
+    def lease(self) -> Iterator[SyncGoTrueClient]:
+        """Empresta um cliente em exclusivo (bloqueia se o pool estiver esgotado)"""
+        client = self._clients.get()
+        try:
+            yield client
+        finally:
+            # Nenhuma sessão passa para o próximo pedido
+            client._remove_session()
+            self._clients.put(client)
+
+    async def run(self, fn: Callable[[SyncGoTrueClient], T]) -> T:
+        """Executa fn(cliente) no threadpool com um cliente emprestado"""
+        def call() -> T:
+            with self.lease() as client:
+                return fn(client)
+        return await run_in_threadpool(call)
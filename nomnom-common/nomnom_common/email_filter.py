@@ -0,0 +1,154 @@
+import hashlib
+import math
+import threading
+from typing import Dict, Iterable, List, Optional
+
+# Parâmetros fixos (e não Settings): os dois serviços escrevem no mesmo
+# bitset, por isso têm de calcular as mesmas posições
+EMAIL_FILTER_CAPACITY = 1000000
+EMAIL_FILTER_FALSE_POSITIVE_RATE = 0.01
+
+
+class EmailFilter:
+    """
+    Bloom filter dos emails com perfil na tabela Utilizador, num Redis
+    partilhado pelo backend e pela Account Management API
+
+    Um "não" é definitivo e dispensa a consulta à base de dados; um "talvez"
+    tem de ser confirmado. Para que o "não" seja correto:
+    - quem cria perfis (registo e PUT /utilizador no backend, POST
+      /utilizador na Account Management API) chama add() ANTES de escrever
+      em Utilizador; um bit a mais só gera um "talvez";
+    - o filtro só responde "não" depois de uma reconstrução completa a
+      partir da base de dados (chave "ready", com expiração) e enquanto o
+      bitset existir;
+    - se um add() falhar, a chave "ready" é apagada e o filtro responde
+      "talvez" até à reconstrução seguinte;
+    - qualquer erro do Redis também dá "talvez".
+    Sem Redis (url=None) o filtro está desligado e responde sempre "talvez".
+    A reconstrução é aditiva: emails de perfis apagados ficam como falsos
+    positivos, o que só custa uma consulta.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        capacity: int = EMAIL_FILTER_CAPACITY,
+        false_positive_rate: float = EMAIL_FILTER_FALSE_POSITIVE_RATE,
+        prefix: str = "nomnom:email_filter:"
+    ):
+        self.num_bits = max(8, int(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits_key = prefix + "bits"
+        self._ready_key = prefix + "ready"
+        self._redis = None
+        if url:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("email_filter_redis_url requer o pacote 'redis' (pip install redis)")
+            self._redis = redis.Redis.from_url(url)
+        self._lock = threading.Lock()
+        self.negatives = 0
+        self.maybes = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._redis is not None
+
+    @staticmethod
+    def _normalize(email: str) -> str:
+        return email.strip().lower()
+
+    def _positions(self, email: str) -> List[int]:
+        digest = hashlib.sha256(self._normalize(email).encode()).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def _error(self):
+        with self._lock:
+            self.errors += 1
+
+    def add(self, email: str):
+        """Marca o email como (possivelmente) existente; chamar antes de escrever em Utilizador"""
+        if self._redis is None:
+            return
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            for pos in self._positions(email):
+                pipe.setbit(self._bits_key, pos, 1)
+            pipe.execute()
+        except Exception as e:
+            self._error()
+            print(f"Aviso: Erro ao atualizar filtro de emails: {str(e)}")
+            # Sem o bit o "não" deixaria de ser correto: desligar até à reconstrução
+            try:
+                self._redis.delete(self._ready_key)
+            except Exception:
+                pass
+
+    def might_exist(self, email: str) -> bool:
+        """False apenas quando o email de certeza não tem perfil"""
+        return self.might_exist_many([email])[0]
+
+    def might_exist_many(self, emails: List[str]) -> List[bool]:
+        """might_exist para vários emails, numa única ida ao Redis"""
+        if self._redis is None:
+            answers = [True] * len(emails)
+        else:
+            try:
+                pipe = self._redis.pipeline(transaction=False)
+                pipe.exists(self._ready_key, self._bits_key)
+                for email in emails:
+                    for pos in self._positions(email):
+                        pipe.getbit(self._bits_key, pos)
+                present, *bits = pipe.execute()
+            except Exception:
+                self._error()
+                present, bits = 0, []
+            if present < 2:
+                answers = [True] * len(emails)
+            else:
+                k = self.num_hashes
+                answers = [all(bits[i * k:(i + 1) * k]) for i in range(len(emails))]
+
+        with self._lock:
+            negatives = answers.count(False)
+            self.negatives += negatives
+            self.maybes += len(answers) - negatives
+        return answers
+
+    def rebuild(self, emails: Iterable[str], ready_seconds: int, batch_size: int = 1000):
+        """
+        Acrescenta todos os emails da tabela Utilizador e volta a ligar o "não"
+
+        ready_seconds deve cobrir várias reconstruções: se deixarem de
+        acontecer, o filtro volta a responder sempre "talvez".
+        """
+        if self._redis is None:
+            return
+        pipe = self._redis.pipeline(transaction=False)
+        pending = 0
+        for email in emails:
+            for pos in self._positions(email):
+                pipe.setbit(self._bits_key, pos, 1)
+            pending += 1
+            if pending >= batch_size:
+                pipe.execute()
+                pending = 0
+        # Bit sentinela, fora das posições do hash: o bitset existe mesmo com a tabela vazia
+        pipe.setbit(self._bits_key, self.num_bits, 1)
+        pipe.set(self._ready_key, 1, ex=ready_seconds)
+        pipe.execute()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "bits": self.num_bits,
+                "negatives": self.negatives,
+                "maybes": self.maybes,
+                "errors": self.errors,
+            }
@@ -0,0 +1,197 @@
+import json
+import math
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Callable, Dict, Optional, Tuple
+
+
+class InMemoryBucketStore:
+    """Token buckets em memória (um processo); os mais antigos são descartados"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def consume(self, key: str, rate: float, capacity: float) -> Tuple[bool, float]:
+        """Consome um token; retorna (permitido, segundos até haver token)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - last) * rate)
+            if tokens >= 1:
+                allowed, retry_after = True, 0.0
+                tokens -= 1
+            else:
+                allowed, retry_after = False, (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+
+class RedisBucketStore:
+    """Token buckets partilhados entre workers, num Redis (script Lua atómico)"""
+
+    SCRIPT = """
+    local rate = tonumber(ARGV[1])
+    local capacity = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(data[1]) or capacity
+    local ts = tonumber(data[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    local allowed = 0
+    local retry_after = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    else
+        retry_after = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(retry_after)}
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("rate_limit_redis_url requer o pacote 'redis' (pip install redis)")
+        self.prefix = prefix
+        self._redis = redis.from_url(url)
+        self._script = self._redis.register_script(self.SCRIPT)
+
+    async def consume(self, key: str, rate: float, capacity: float) -> Tuple[bool, float]:
+        allowed, retry_after = await self._script(
+            keys=[self.prefix + key],
+            args=[rate, capacity, time.time()]
+        )
+        return bool(int(allowed)), float(retry_after)
+
+
+class RateLimiter:
+    """
+    Limites por rota com token bucket por IP e por email
+
+    As regras são por sufixo do caminho (Settings.rate_limit_rules nos serviços):
+        {"/auth/login": {"ip_per_minute": 20, "email_per_minute": 5}, ...}
+    Cada limite por minuto é também o tamanho do burst.
+    """
+
+    def __init__(self, rules: Dict[str, Dict[str, float]], store):
+        self.rules = rules
+        self.store = store
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(lambda: {"allowed": 0, "rejected": 0})
+
+    def match(self, path: str) -> Optional[str]:
+        for route in self.rules:
+            if path.rstrip("/").endswith(route):
+                return route
+        return None
+
+    async def check(self, route: str, ip: Optional[str], email: Optional[str]) -> Tuple[bool, float]:
+        """Consome um token de cada bucket aplicável; retorna (permitido, retry_after)"""
+        rule = self.rules[route]
+        checks = []
+        if ip and rule.get("ip_per_minute"):
+            checks.append(("ip", ip, rule["ip_per_minute"]))
+        if email and rule.get("email_per_minute"):
+            checks.append(("email", email, rule["email_per_minute"]))
+
+        for dimension, value, per_minute in checks:
+            allowed, retry_after = await self.store.consume(
+                f"{route}:{dimension}:{value}", per_minute / 60, per_minute
+            )
+            self._count(f"{route}:{dimension}", allowed)
+            if not allowed:
+                return False, retry_after
+        return True, 0.0
+
+    def _count(self, name: str, allowed: bool):
+        with self._lock:
+            self._counters[name]["allowed" if allowed else "rejected"] += 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {name: dict(counts) for name, counts in self._counters.items()}
+
+
+class RateLimitMiddleware:
+    """
+    Middleware ASGI que rejeita com 429 os pedidos acima do limite,
+    antes de chegarem ao Supabase Auth
+
+    Para o limite por email lê o corpo JSON do pedido e volta a
+    entregá-lo intacto à aplicação. `get_limiter` devolve o RateLimiter do
+    serviço (criado só no primeiro pedido, por causa do cliente Redis).
+    """
+
+    MAX_BODY_BYTES = 64 * 1024
+
+    def __init__(self, app, get_limiter: Callable[[], RateLimiter], enabled: bool = True):
+        self.app = app
+        self.get_limiter = get_limiter
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.get_limiter()
+        route = limiter.match(scope["path"])
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        # Ler o corpo para obter o email
+        body = b""
+        more_body = True
+        while more_body and len(body) <= self.MAX_BODY_BYTES:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        email = None
+        if not more_body:
+            try:
+                payload = json.loads(body or b"{}")
+                if isinstance(payload, dict) and isinstance(payload.get("email"), str):
+                    email = payload["email"].strip().lower()
+            except ValueError:
+                pass
+
+        client = scope.get("client")
+        allowed, retry_after = await limiter.check(route, client[0] if client else None, email)
+
+        if not allowed:
+            content = json.dumps({
+                "detail": "Muitas tentativas. Aguarde alguns instantes e tente novamente."
+            }).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(content)).encode()),
+                    (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": content})
+            return
+
+        # Reentregar o corpo já lido (e o resto, se for maior que o limite)
+        replayed = False
+
+        async def replay_receive():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": more_body}
+            return await receive()
+
+        await self.app(scope, replay_receive, send)
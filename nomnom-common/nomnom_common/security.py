@@ -0,0 +1,323 @@
+import hashlib
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import jwt
+from fastapi import HTTPException, status
+from gotrue.errors import AuthError
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+
+from nomnom_common.auth import AuthClientPool
+
+
+class AuthenticatedUser(BaseModel):
+    """Utilizador autenticado, extraído das claims do access token"""
+    id: str
+    email: Optional[str] = None
+    role: Optional[str] = None
+    user_metadata: Dict[str, Any] = Field(default_factory=dict)
+    expires_at: int
+    profile_complete: bool = False
+
+
+class LocalVerificationUnavailable(Exception):
+    """Não há chave configurada para verificar o token localmente"""
+
+
+class TokenVerifier:
+    """
+    Verifica localmente os access tokens emitidos pelo Supabase Auth
+
+    Valida assinatura, expiração e audience sem chamar auth.get_user().
+    Tokens HS* usam o JWT secret do projeto; tokens assimétricos (ES256/RS256)
+    usam o JWKS do projeto, guardado em cache e recarregado quando aparece
+    um `kid` desconhecido (rotação de chaves). Sem a chave correspondente
+    levanta LocalVerificationUnavailable e o token é validado pelo Supabase.
+    """
+
+    HMAC_ALGORITHMS = ["HS256", "HS384", "HS512"]
+    ASYMMETRIC_ALGORITHMS = ["ES256", "RS256", "EdDSA"]
+
+    def __init__(
+        self,
+        jwt_secret: Optional[str],
+        jwks_url: Optional[str],
+        audience: str = "authenticated",
+        jwks_cache_seconds: int = 600,
+        leeway_seconds: int = 10
+    ):
+        self.jwt_secret = jwt_secret
+        self.audience = audience
+        self.leeway_seconds = leeway_seconds
+        self.jwks_client = (
+            jwt.PyJWKClient(jwks_url, cache_keys=True, lifespan=jwks_cache_seconds)
+            if jwks_url else None
+        )
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """
+        Valida o token e retorna as suas claims
+
+        Raises:
+            jwt.InvalidTokenError: Se o token for inválido, expirado ou de outra audience
+            LocalVerificationUnavailable: Se faltar o JWT secret / JWKS para o algoritmo
+        """
+        algorithm = jwt.get_unverified_header(token).get("alg")
+
+        if algorithm in self.HMAC_ALGORITHMS:
+            if not self.jwt_secret:
+                raise LocalVerificationUnavailable("JWT secret não configurado")
+            key = self.jwt_secret
+        elif algorithm in self.ASYMMETRIC_ALGORITHMS:
+            if not self.jwks_client:
+                raise LocalVerificationUnavailable("JWKS não configurado")
+            key = self.jwks_client.get_signing_key_from_jwt(token).key
+        else:
+            raise jwt.InvalidTokenError(f"Algoritmo não suportado: {algorithm}")
+
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[algorithm],
+            audience=self.audience,
+            leeway=self.leeway_seconds,
+            options={"require": ["exp", "sub"]}
+        )
+
+
+class TokenCache:
+    """
+    Cache LRU de tokens já verificados (hash SHA-256 do token -> utilizador)
+
+    Cada entrada expira no `exp` do próprio token. O logout revoga o token:
+    o hash fica numa lista de revogados até ao `exp`, verificada antes da
+    cache e da verificação local (que continuaria a aceitar o JWT). As
+    escritas no perfil removem os tokens do email (profile_complete), mas
+    só as feitas neste processo; o perfil também pode ser criado pelo outro
+    serviço, por isso um utilizador com profile_complete=False só fica em
+    cache durante incomplete_profile_seconds e volta a ser consultado.
+    """
+
+    def __init__(self, max_entries: int = 10000, incomplete_profile_seconds: float = 5):
+        self.max_entries = max_entries
+        self.incomplete_profile_seconds = incomplete_profile_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, AuthenticatedUser]]" = OrderedDict()
+        self._by_email: Dict[str, Set[str]] = {}
+        self._revoked: Dict[str, float] = {}
+        self._revoked_expiry: List[Tuple[float, str]] = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[AuthenticatedUser]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, token: str, user: AuthenticatedUser):
+        key = self._key(token)
+        with self._lock:
+            self._remove(key)
+            expires_at = user.expires_at
+            if not user.profile_complete:
+                expires_at = min(expires_at, time.time() + self.incomplete_profile_seconds)
+            self._entries[key] = (expires_at, user)
+            if user.email:
+                self._by_email.setdefault(user.email, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, token: str):
+        """Remove um token da cache"""
+        with self._lock:
+            self._remove(self._key(token))
+
+    def revoke(self, token: str, expires_at: float):
+        """Remove o token e rejeita-o até expirar (ex.: logout)"""
+        key = self._key(token)
+        with self._lock:
+            self._remove(key)
+            self._purge_revoked()
+            if expires_at > time.time():
+                self._revoked[key] = expires_at
+                heapq.heappush(self._revoked_expiry, (expires_at, key))
+
+    def is_revoked(self, token: str) -> bool:
+        key = self._key(token)
+        with self._lock:
+            expires_at = self._revoked.get(key)
+            return expires_at is not None and expires_at > time.time()
+
+    def invalidate_email(self, email: str):
+        """Remove todos os tokens de um email (ex.: perfil alterado)"""
+        with self._lock:
+            for key in list(self._by_email.get(email, ())):
+                self._remove(key)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "revoked": len(self._revoked),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+    def _purge_revoked(self):
+        now = time.time()
+        while self._revoked_expiry and self._revoked_expiry[0][0] <= now:
+            _, key = heapq.heappop(self._revoked_expiry)
+            if self._revoked.get(key, now + 1) <= now:
+                del self._revoked[key]
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        user = entry[1] if entry is not None else None
+        if user is not None and user.email:
+            keys = self._by_email.get(user.email)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_email[user.email]
+
+
+def extract_bearer_token(authorization: Optional[str]) -> str:
+    """Extrai o token do header Authorization ou levanta 401"""
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="This endpoint requires a valid Bearer token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return authorization[7:]  # Remove "Bearer " prefix
+
+
+class Authenticator:
+    """
+    Autentica pedidos pelo Bearer token
+
+    Ordem: tokens revogados -> cache de tokens -> verificação local (ou
+    Supabase Auth, sem chave local) -> estado do perfil. Cada serviço injeta
+    `load_profile_complete(email)`, que diz se o email já tem perfil na
+    tabela Utilizador (None se a consulta falhar; o resultado não fica em
+    cache nesse caso).
+    """
+
+    def __init__(
+        self,
+        verifier: TokenVerifier,
+        cache: TokenCache,
+        auth_pool: AuthClientPool,
+        load_profile_complete: Callable[[Optional[str]], Optional[bool]]
+    ):
+        self.verifier = verifier
+        self.cache = cache
+        self.auth_pool = auth_pool
+        self.load_profile_complete = load_profile_complete
+
+    def _fetch_claims(self, token: str) -> Dict[str, Any]:
+        """
+        Claims do token validado pelo Supabase Auth (auth.get_user)
+
+        Usado quando o token não pode ser verificado localmente, por exemplo
+        tokens HS256 sem SUPABASE_JWT_SECRET configurado.
+        """
+        with self.auth_pool.lease() as auth:
+            response = auth.get_user(token)
+        if not response or not response.user:
+            raise jwt.InvalidTokenError("Token rejeitado pelo Supabase Auth")
+        # A assinatura já foi validada pelo Supabase; daqui só interessa o exp
+        unverified = jwt.decode(token, options={"verify_signature": False})
+        return {
+            "sub": response.user.id,
+            "email": response.user.email,
+            "role": response.user.role,
+            "user_metadata": response.user.user_metadata,
+            "exp": unverified["exp"],
+        }
+
+    def verify(self, token: str) -> Tuple[AuthenticatedUser, bool]:
+        """
+        Verifica o token e carrega o estado do perfil (corre no threadpool)
+
+        Returns:
+            (utilizador, pode ficar em cache)
+        """
+        try:
+            claims = self.verifier.verify(token)
+        except LocalVerificationUnavailable:
+            try:
+                claims = self._fetch_claims(token)
+            except AuthError as e:
+                raise jwt.InvalidTokenError(str(e))
+
+        profile_complete = self.load_profile_complete(claims.get("email"))
+        user = AuthenticatedUser(
+            id=claims["sub"],
+            email=claims.get("email"),
+            role=claims.get("role"),
+            user_metadata=claims.get("user_metadata") or {},
+            expires_at=claims["exp"],
+            profile_complete=bool(profile_complete)
+        )
+        # Só guardar em cache quando o perfil foi consultado com sucesso
+        return user, profile_complete is not None
+
+    async def authenticate(self, authorization: Optional[str]) -> AuthenticatedUser:
+        """Utilizador do header Authorization, ou HTTPException 401"""
+        token = extract_bearer_token(authorization)
+
+        if self.cache.is_revoked(token):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Sessão terminada",
+                headers={"WWW-Authenticate": "Bearer"}
+            )
+        user = self.cache.get(token)
+        if user is not None:
+            return user
+
+        try:
+            # JWKS e consulta ao perfil fazem I/O bloqueante: fora do event loop
+            user, cacheable = await run_in_threadpool(self.verify, token)
+        except jwt.PyJWTError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token inválido ou expirado",
+                headers={"WWW-Authenticate": "Bearer"}
+            )
+
+        if cacheable:
+            self.cache.put(token, user)
+        return user
+
+    def revoke(self, token: str):
+        """Revoga o token neste processo até ao seu `exp` (logout)"""
+        try:
+            # Só interessa o exp; um token com assinatura inválida já seria rejeitado
+            expires_at = jwt.decode(token, options={"verify_signature": False})["exp"]
+        except (jwt.PyJWTError, KeyError):
+            return
+        self.cache.revoke(token, expires_at)